@@ -0,0 +1,102 @@
+"""
+Latency of the stop arrivals endpoint under kiosk-style polling.
+
+Builds a throwaway database with many stops and buses (and a deep ETA
+history), then polls /api/stops/<stop_id>/arrivals/ for random stops and
+reports latency percentiles and queries per request.
+
+Usage:
+  python benchmarks/bench_arrivals.py [--stops 500] [--buses 300] [--history 20] [--requests 2000]
+"""
+import argparse
+import datetime as dt
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import CaptureQueriesContext, setup_test_environment  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from core.arrivals import update_stop_arrivals  # noqa: E402
+from core.models import Bus, BusStop, ETARecord  # noqa: E402
+
+# Target for one request, measured in-process (no network)
+TARGET_P95_MS = 10.0
+
+
+def populate(n_stops, n_buses, history, rng):
+    stops = BusStop.objects.bulk_create([
+        BusStop(stop_id=f"S{i:04d}", name=f"Stop {i}", latitude=40.44, longitude=-79.94)
+        for i in range(n_stops)
+    ])
+    buses = Bus.objects.bulk_create([Bus(bus_id=f"B{i:03d}", capacity=60) for i in range(n_buses)])
+    # recent reports, so predictions are still on the board
+    t0 = timezone.now() - dt.timedelta(seconds=30 * history)
+    # each bus serves a route of 20 stops
+    for bus in buses:
+        route = rng.sample(stops, min(20, n_stops))
+        etas = [
+            ETARecord(bus=bus, stop=stop, source_timestamp=t0 + dt.timedelta(seconds=30 * h),
+                      eta_seconds=rng.randint(30, 1800), distance_m=rng.uniform(100, 8000))
+            for h in range(history)
+            for stop in route
+        ]
+        ETARecord.objects.bulk_create(etas, batch_size=2000)
+        update_stop_arrivals(etas)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--stops", type=int, default=500)
+    ap.add_argument("--buses", type=int, default=300)
+    ap.add_argument("--history", type=int, default=20)
+    ap.add_argument("--requests", type=int, default=2000)
+    args = ap.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        rng = random.Random(12780)
+        start = time.perf_counter()
+        populate(args.stops, args.buses, args.history, rng)
+        print(f"populated {ETARecord.objects.count():,} ETA records in {time.perf_counter() - start:.1f} s")
+
+        client = Client()
+        stop_ids = list(BusStop.objects.values_list("stop_id", flat=True))
+        client.get(f"/api/stops/{stop_ids[0]}/arrivals/")  # warm up
+
+        latencies = []
+        queries = []
+        for _ in range(args.requests):
+            stop_id = rng.choice(stop_ids)
+            with CaptureQueriesContext(connection) as ctx:
+                t = time.perf_counter()
+                resp = client.get(f"/api/stops/{stop_id}/arrivals/")
+                latencies.append((time.perf_counter() - t) * 1000)
+            assert resp.status_code == 200
+            queries.append(len(ctx.captured_queries))
+
+        latencies.sort()
+        p50 = statistics.median(latencies)
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        p99 = latencies[int(len(latencies) * 0.99) - 1]
+        print(f"{args.requests} requests: p50 {p50:.2f} ms, p95 {p95:.2f} ms, p99 {p99:.2f} ms, "
+              f"max queries/request {max(queries)}")
+        print(f"target p95 < {TARGET_P95_MS} ms: {'OK' if p95 < TARGET_P95_MS else 'MISSED'}")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Replay a synthetic day of GPS data through the ETA estimator.
+
+Each bus drives out-and-back along a straight route, stopping at stops and
+lights, reporting every 10 s for 18 service hours. The benchmark reports
+update throughput and compares ETA availability and stability against the
+instantaneous distance / speed method.
+
+Usage:
+  python benchmarks/bench_eta.py [--buses 200] [--interval 10]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.eta import ETAEstimator, haversine_m  # noqa: E402
+
+STOP = (40.4440, -79.9440)
+SERVICE_HOURS = 18
+
+
+def replay_day(n_buses, interval_s, seed=12780):
+    rng = random.Random(seed)
+    steps = SERVICE_HOURS * 3600 // interval_s
+    t0 = 1765760400.0  # 2025-12-15T01:00:00Z
+    records = []
+    for b in range(n_buses):
+        lat = STOP[0] - 0.02 + rng.random() * 0.01
+        lon = STOP[1]
+        direction = 1
+        dwell = 0
+        for i in range(steps):
+            if dwell > 0:
+                dwell -= 1
+                speed_kmh = 0.0
+            else:
+                speed_kmh = max(0.0, rng.gauss(28.0, 6.0))
+                if rng.random() < 0.08:
+                    dwell = rng.randint(1, 9)  # 10-90 s stop or red light
+            lat += direction * speed_kmh / 3.6 * interval_s / 111_320.0
+            if abs(lat - STOP[0]) > 0.03:
+                direction = -direction
+            records.append((f"B{b:03d}", t0 + i * interval_s, lat, lon, speed_kmh))
+    # interleave buses by time, as a live feed would arrive
+    records.sort(key=lambda r: r[1])
+    return records
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--buses", type=int, default=200)
+    ap.add_argument("--interval", type=int, default=10)
+    args = ap.parse_args()
+
+    records = replay_day(args.buses, args.interval)
+    print(f"replayed {len(records):,} GPS records ({args.buses} buses, {SERVICE_HOURS} h)")
+
+    est = ETAEstimator()
+    start = time.perf_counter()
+    speeds = est.update_many(records)
+    elapsed = time.perf_counter() - start
+    print(f"update:     {elapsed:.2f} s  ({len(records) / elapsed:,.0f} records/s, "
+          f"{elapsed / len(records) * 1e6:.2f} us/record)")
+
+    inst_missing = smooth_missing = 0
+    inst_jumps = smooth_jumps = 0
+    last_inst = {}
+    last_smooth = {}
+    for (bus_id, _, lat, lon, speed_kmh), smooth in zip(records, speeds):
+        d = haversine_m(lat, lon, STOP[0], STOP[1])
+        inst_speed = speed_kmh / 3.6
+        inst = d / inst_speed if inst_speed >= 1.0 else None
+        sm = d / smooth if smooth else None
+        inst_missing += inst is None
+        smooth_missing += sm is None
+        # count ETA changes of more than 2 minutes between consecutive records
+        for cur, last, name in ((inst, last_inst, "inst"), (sm, last_smooth, "smooth")):
+            prev = last.get(bus_id)
+            if cur is not None and prev is not None and abs(cur - prev) > 120:
+                if name == "inst":
+                    inst_jumps += 1
+                else:
+                    smooth_jumps += 1
+            if cur is not None:
+                last[bus_id] = cur
+
+    n = len(records)
+    print(f"instantaneous: {inst_missing / n:6.1%} missing, {inst_jumps:,} jumps > 2 min")
+    print(f"smoothed:      {smooth_missing / n:6.1%} missing, {smooth_jumps:,} jumps > 2 min")
+
+
+if __name__ == "__main__":
+    main()
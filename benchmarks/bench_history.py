@@ -0,0 +1,77 @@
+"""
+Throughput of the chunked history export.
+
+Fills a throwaway database with GPS records, then exports them in each
+format through core.history and reports rows/s, output size and how much
+the process's peak RSS grew (which should stay flat as --rows grows).
+
+Usage:
+  python benchmarks/bench_history.py [--rows 1000000] [--buses 100]
+"""
+import argparse
+import datetime as dt
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+
+from core.history import FORMATS, export_chunks, history_queryset, iter_frames  # noqa: E402
+from core.models import Bus, GPSRecord  # noqa: E402
+
+
+def populate(n_rows, n_buses):
+    buses = Bus.objects.bulk_create([Bus(bus_id=f"B{i:03d}", capacity=60) for i in range(n_buses)])
+    t0 = dt.datetime(2025, 12, 15, tzinfo=dt.timezone.utc)
+    per_bus = n_rows // n_buses
+    for bus in buses:
+        GPSRecord.objects.bulk_create(
+            [
+                GPSRecord(bus=bus, timestamp=t0 + dt.timedelta(seconds=10 * i), latitude=40.44 + i * 1e-6,
+                          longitude=-79.94, speed=25.0, weight=2000.0 + i % 500)
+                for i in range(per_bus)
+            ],
+            batch_size=5000,
+        )
+    return per_bus * n_buses
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--buses", type=int, default=100)
+    args = ap.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        start = time.perf_counter()
+        n = populate(args.rows, args.buses)
+        print(f"populated {n:,} GPS records in {time.perf_counter() - start:.1f} s")
+
+        for fmt in FORMATS:
+            rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            start = time.perf_counter()
+            size = 0
+            for data in export_chunks("gps", fmt, iter_frames("gps", history_queryset("gps"))):
+                size += len(data)
+            elapsed = time.perf_counter() - start
+            # ru_maxrss is in KiB on Linux
+            growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+            print(f"{fmt:8s} {elapsed:6.2f} s  {n / elapsed:10,.0f} rows/s  "
+                  f"{size / 1e6:7.1f} MB out  peak RSS +{growth / 1024:.0f} MB")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
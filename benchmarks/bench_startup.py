@@ -0,0 +1,83 @@
+"""
+Measure cold start of a web worker.
+
+For each run a fresh interpreter imports config.wsgi (what a gunicorn worker
+does) and serves one request to "/". Reports:
+
+  - time to first response (process start -> first response body)
+  - total `-X importtime` self time, and the packages that cost the most
+  - whether any lazily loaded heavy library was imported at startup
+
+Usage:
+  python benchmarks/bench_startup.py [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LAZY_MODULES = ("pandas", "numpy", "openpyxl")
+
+PROBE = """
+import time
+t0 = time.perf_counter()
+from wsgiref.util import setup_testing_defaults
+from config.wsgi import application
+environ = {}
+setup_testing_defaults(environ)
+environ["HTTP_HOST"] = "localhost"
+body = b"".join(application(environ, lambda status, headers: None))
+print(time.perf_counter() - t0)
+"""
+
+
+def run_probe(importtime=False):
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ["-X", "importtime"]
+    cmd += ["-c", PROBE]
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE="config.settings")
+    proc = subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return float(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def parse_importtime(stderr):
+    """Return [(self_us, cumulative_us, module)] from `-X importtime` output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cum_us), name.strip()))
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args()
+
+    firsts = [run_probe()[0] for _ in range(args.runs)]
+    print(f"time to first response: median {statistics.median(firsts) * 1000:.0f} ms "
+          f"(min {min(firsts) * 1000:.0f}, max {max(firsts) * 1000:.0f}, {args.runs} runs)")
+
+    _, stderr = run_probe(importtime=True)
+    rows = parse_importtime(stderr)
+    print(f"importtime total (self): {sum(r[0] for r in rows) / 1000:.0f} ms over {len(rows)} modules")
+    per_package = {}
+    for self_us, _, name in rows:
+        root = name.split(".")[0]
+        per_package[root] = per_package.get(root, 0) + self_us
+    print("largest packages (self time):")
+    for root, self_us in sorted(per_package.items(), key=lambda kv: kv[1], reverse=True)[:10]:
+        print(f"  {self_us / 1000:8.1f} ms  {root}")
+
+    loaded = sorted({r[2].split(".")[0] for r in rows} & set(LAZY_MODULES))
+    print(f"heavy modules loaded at startup: {', '.join(loaded) if loaded else 'none'}")
+
+
+if __name__ == "__main__":
+    main()
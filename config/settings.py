@@ -77,6 +77,13 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": {
+            # Wait for concurrent writers (ingest, recompute workers) instead of failing
+            "timeout": 30,
+            # WAL lets writers proceed while a long read (a streaming history
+            # export) is open; the default rollback journal would block them
+            "init_command": "PRAGMA journal_mode=WAL;",
+        },
     }
 }
 
@@ -121,3 +128,24 @@ STATIC_URL = "static/"
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+
+# Parameters for derived CrowdingRecord/ETARecord (see core/derivation.py).
+# After recalibrating, rebuild stored records with:
+#   python manage.py recompute_derived
+DERIVATION = {
+    "PASSENGER_WEIGHT_KG": 75.0,
+    "CROWDING_LEVELS": [(0.5, "LOW"), (0.8, "MEDIUM"), (1.0, "HIGH")],
+    "CROWDING_TOP_LEVEL": "OVERCROWDED",
+    "ETA_ESTIMATOR": {"tau_s": 60.0, "history": 10, "min_speed_mps": 1.0, "max_speed_mps": 40.0},
+}
+
+# Depots upload several hundred per-bus CSVs at once (Django's default limit is 100)
+DATA_UPLOAD_MAX_NUMBER_FILES = 1000
+
+# Processes used to parse multi-file uploads (None: one per CPU)
+UPLOAD_PARSE_WORKERS = None
+
+# Stop arrivals board: hide buses predicted to arrive (or, with an unknown ETA,
+# last reported) more than this many seconds ago
+ARRIVALS_GRACE_SECONDS = 300
@@ -32,12 +32,15 @@ urlpatterns = [
     path("admin/", admin.site.urls),
 ]
 
-from core.views import home, upload_csv, dashboard, export_xlsx
+from core.views import home, upload_csv, dashboard, export_xlsx, export_history, stop_arrivals, crowding_heatmap
 
 urlpatterns = [
     path("", home, name="home"),
     path("upload/", upload_csv, name="upload_csv"),
     path("dashboard/", dashboard, name="dashboard"),
     path("export.xlsx", export_xlsx, name="export_xlsx"),
+    path("export/history", export_history, name="export_history"),
+    path("api/stops/<str:stop_id>/arrivals/", stop_arrivals, name="stop_arrivals"),
+    path("api/heatmap/", crowding_heatmap, name="crowding_heatmap"),
     path("admin/", admin.site.urls),
 ]
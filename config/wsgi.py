@@ -10,7 +10,14 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 import os
 
 from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 
 application = get_wsgi_application()
+
+# Django imports the URLconf (and with it every view module) on the first
+# request. Do it here instead, so a preloading server (gunicorn --preload)
+# pays for it once in the master and forked workers answer straight away.
+# No database connection is opened at import time, so this is fork-safe.
+get_resolver().url_patterns
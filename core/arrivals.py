@@ -0,0 +1,103 @@
+"""
+Per-stop arrivals index.
+
+StopArrival holds the latest ETARecord of every bus for every stop, with the
+predicted arrival time precomputed. Ingest and recompute keep it current, so
+"next arrivals at stop S" is one indexed query ordered by predicted arrival.
+"""
+import datetime as dt
+
+from django.conf import settings
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .models import ETARecord, StopArrival
+
+BULK_BATCH_SIZE = 2000
+
+UPDATE_FIELDS = ["eta_record", "source_timestamp", "predicted_arrival", "eta_seconds", "distance_m"]
+
+
+def _fields_from(eta):
+    predicted = None
+    if eta.eta_seconds is not None:
+        predicted = eta.source_timestamp + dt.timedelta(seconds=eta.eta_seconds)
+    return {
+        "eta_record": eta,
+        "source_timestamp": eta.source_timestamp,
+        "predicted_arrival": predicted,
+        "eta_seconds": eta.eta_seconds,
+        "distance_m": eta.distance_m,
+    }
+
+
+def update_stop_arrivals(eta_records):
+    """
+    Fold newly saved ETARecords into the index.
+
+    Only the newest record per (stop, bus) is kept, and an existing entry is
+    replaced only by a newer source timestamp, so out-of-order uploads are safe.
+    """
+    latest = {}
+    for eta in eta_records:
+        key = (eta.stop_id, eta.bus_id)
+        current = latest.get(key)
+        if current is None or eta.source_timestamp >= current.source_timestamp:
+            latest[key] = eta
+    if not latest:
+        return
+
+    stop_ids = {k[0] for k in latest}
+    bus_ids = {k[1] for k in latest}
+    existing = {
+        (stop_id, bus_id): source_ts
+        for stop_id, bus_id, source_ts in StopArrival.objects.filter(
+            stop_id__in=stop_ids, bus_id__in=bus_ids,
+        ).values_list("stop_id", "bus_id", "source_timestamp")
+    }
+
+    # Upsert rather than insert-or-update, so a concurrent upload creating the
+    # same (stop, bus) entry cannot trip the unique constraint
+    arrivals = [
+        StopArrival(stop_id=stop_id, bus_id=bus_id, **_fields_from(eta))
+        for (stop_id, bus_id), eta in latest.items()
+        if (stop_id, bus_id) not in existing or eta.source_timestamp >= existing[(stop_id, bus_id)]
+    ]
+    StopArrival.objects.bulk_create(
+        arrivals,
+        batch_size=BULK_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=["stop", "bus"],
+        update_fields=UPDATE_FIELDS,
+    )
+
+
+def rebuild_stop_arrivals(bus_pk):
+    """Rebuild one bus's index entries from its ETARecords (after a recompute)."""
+    StopArrival.objects.filter(bus_id=bus_pk).delete()
+    # Latest record per stop, in one windowed query
+    latest = (
+        ETARecord.objects.filter(bus_id=bus_pk)
+        .annotate(recency=Window(
+            RowNumber(), partition_by=[F("stop_id")], order_by=[F("source_timestamp").desc(), F("id").desc()],
+        ))
+        .filter(recency=1)
+    )
+    update_stop_arrivals(list(latest))
+
+
+def arrivals_for_stop(stop_id, limit, now=None):
+    """
+    Next arrivals at a stop (by stop_id), soonest first; unknown ETAs last.
+
+    Entries predicted more than ARRIVALS_GRACE_SECONDS before `now` (or, with
+    an unknown ETA, last reported before then) are stale and left out.
+    """
+    cutoff = (now or timezone.now()) - dt.timedelta(seconds=settings.ARRIVALS_GRACE_SECONDS)
+    return list(
+        StopArrival.objects.filter(stop__stop_id=stop_id)
+        .filter(Q(predicted_arrival__gte=cutoff) | Q(predicted_arrival__isnull=True, source_timestamp__gte=cutoff))
+        .select_related("bus")
+        .order_by(F("predicted_arrival").asc(nulls_last=True), "bus__bus_id")[:limit]
+    )
@@ -0,0 +1,27 @@
+"""Fixtures shared by tests that load data through the CSV upload view."""
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+CSV_HEADER = "bus_id,timestamp,lat,lon,speed,capacity,weight,stop_id,stop_name,stop_lat,stop_lon\n"
+
+
+@pytest.fixture
+def csv_file():
+    """Build an uploadable CSV from data rows; the header is prepended."""
+    def make(name, rows):
+        return SimpleUploadedFile(name, (CSV_HEADER + rows).encode())
+    return make
+
+
+@pytest.fixture
+def upload(client, db, csv_file):
+    """POST data rows to /upload/ as one CSV file and return the response."""
+    def post(rows, name="a.csv", **kwargs):
+        return client.post("/upload/", {"file": csv_file(name, rows)}, **kwargs)
+    return post
+
+
+@pytest.fixture
+def uploaded(upload, request):
+    """Upload the ROWS of the requesting test module."""
+    return upload(request.module.ROWS)
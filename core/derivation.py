@@ -0,0 +1,54 @@
+"""
+Parameters for deriving CrowdingRecord and ETARecord from GPS data.
+
+The values live in settings.DERIVATION so they can be recalibrated without
+code changes. Records already stored keep the old values until
+`python manage.py recompute_derived` is run.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+
+from .eta import ETAEstimator
+
+DEFAULTS = {
+    # Assumed average passenger weight
+    "PASSENGER_WEIGHT_KG": 75.0,
+    # (upper bound, level) pairs in increasing order; ratios at or above
+    # the last bound get CROWDING_TOP_LEVEL
+    "CROWDING_LEVELS": [(0.5, "LOW"), (0.8, "MEDIUM"), (1.0, "HIGH")],
+    "CROWDING_TOP_LEVEL": "OVERCROWDED",
+    # Keyword arguments for core.eta.ETAEstimator
+    "ETA_ESTIMATOR": {"tau_s": 60.0, "history": 10, "min_speed_mps": 1.0, "max_speed_mps": 40.0},
+}
+
+
+def get_params():
+    params = dict(DEFAULTS)
+    params.update(getattr(settings, "DERIVATION", {}))
+    return params
+
+
+def fingerprint(params):
+    """Stable hash of a parameter set, used to tell recompute runs apart."""
+    blob = json.dumps(params, sort_keys=True, default=list)
+    return hashlib.sha256(blob.encode()).hexdigest()[:16]
+
+
+def occupancy_ratio(weight, capacity, params=None):
+    params = params or get_params()
+    return (weight / params["PASSENGER_WEIGHT_KG"]) / float(capacity)
+
+
+def crowding_level(occupancy_ratio: float, params=None) -> str:
+    params = params or get_params()
+    for bound, level in params["CROWDING_LEVELS"]:
+        if occupancy_ratio < bound:
+            return level
+    return params["CROWDING_TOP_LEVEL"]
+
+
+def eta_estimator(params=None):
+    params = params or get_params()
+    return ETAEstimator(**params["ETA_ESTIMATOR"])
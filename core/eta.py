@@ -0,0 +1,128 @@
+"""
+Incremental ETA estimation.
+
+The instantaneous GPS speed drops to ~0 at every dwell and red light, which
+makes distance / speed useless exactly when riders look at the display.
+ETAEstimator keeps a small amount of state per bus and updates it in O(1)
+for each GPS record:
+
+  - an exponentially weighted speed over readings taken while moving
+    (time-aware, so irregular sampling is fine)
+  - a fixed-size window of recent moving-segment speeds, derived from
+    consecutive positions, with a running sum
+
+Stopped readings do not pull the smoothed speed down, so during a dwell the
+ETA holds at the recent cruise speed instead of disappearing or jumping.
+If the reported speed never shows movement, the segment history is used.
+
+This module has no Django dependency so it can be used from any ingest path
+(and benchmarked on its own).
+"""
+import math
+from collections import deque
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    R = 6371000.0
+    p1 = math.radians(lat1)
+    p2 = math.radians(lat2)
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = (math.sin(dlat/2)**2) + math.cos(p1)*math.cos(p2)*(math.sin(dlon/2)**2)
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    return R * c
+
+
+class _BusState:
+    __slots__ = ("t", "lat", "lon", "ewma", "segments", "segment_sum")
+
+    def __init__(self, history):
+        self.t = None
+        self.lat = None
+        self.lon = None
+        self.ewma = None
+        self.segments = deque(maxlen=history)
+        self.segment_sum = 0.0
+
+
+class ETAEstimator:
+    """
+    Per-bus smoothed-speed ETA model.
+
+    tau_s:          EWMA time constant in seconds
+    history:        number of recent moving segments kept per bus
+    min_speed_mps:  below this a bus counts as stopped
+    max_speed_mps:  segment speeds above this are treated as GPS jumps and ignored
+    """
+
+    def __init__(self, tau_s=60.0, history=10, min_speed_mps=1.0, max_speed_mps=40.0):
+        self.tau_s = tau_s
+        self.history = history
+        self.min_speed_mps = min_speed_mps
+        self.max_speed_mps = max_speed_mps
+        self._state = {}
+
+    def update(self, bus_id, timestamp, lat, lon, speed_kmh):
+        """
+        Feed one GPS record and return the bus's effective speed (m/s or None).
+
+        Records older than the last one seen for the bus do not change state.
+        """
+        st = self._state.get(bus_id)
+        if st is None:
+            st = self._state[bus_id] = _BusState(self.history)
+
+        t = timestamp.timestamp() if hasattr(timestamp, "timestamp") else float(timestamp)
+        obs = max(0.0, speed_kmh) * 1000.0 / 3600.0
+        moving = obs >= self.min_speed_mps
+
+        seg = None
+        if st.t is None:
+            if moving:
+                st.ewma = obs
+        elif t > st.t:
+            dt_s = t - st.t
+            if moving:
+                if st.ewma is None:
+                    st.ewma = obs
+                else:
+                    # Cap the gap so the first reading after a long dwell
+                    # does not wipe out the history on its own
+                    alpha = 1.0 - math.exp(-min(dt_s, self.tau_s) / self.tau_s)
+                    st.ewma += alpha * (obs - st.ewma)
+            seg = haversine_m(st.lat, st.lon, lat, lon) / dt_s
+        else:
+            return self._effective(st)
+
+        if seg is not None and self.min_speed_mps <= seg <= self.max_speed_mps:
+            if len(st.segments) == st.segments.maxlen:
+                st.segment_sum -= st.segments[0]
+            st.segments.append(seg)
+            st.segment_sum += seg
+
+        st.t, st.lat, st.lon = t, lat, lon
+        return self._effective(st)
+
+    def update_many(self, records):
+        """Feed (bus_id, timestamp, lat, lon, speed_kmh) tuples; return effective speeds."""
+        update = self.update
+        return [update(*r) for r in records]
+
+    def speed_mps(self, bus_id):
+        st = self._state.get(bus_id)
+        return self._effective(st) if st is not None else None
+
+    def eta_seconds(self, bus_id, distance_m):
+        speed = self.speed_mps(bus_id)
+        if speed is None or distance_m is None:
+            return None
+        return int(distance_m / speed)
+
+    def _effective(self, st):
+        if st.ewma is not None:
+            return st.ewma
+        # Reported speed never showed movement (e.g. a stuck sensor):
+        # fall back to the speed implied by recent position changes
+        if st.segments:
+            return st.segment_sum / len(st.segments)
+        return None
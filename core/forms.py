@@ -1,5 +1,23 @@
 from django import forms
 
 
+class MultipleFileInput(forms.ClearableFileInput):
+    allow_multiple_selected = True
+
+
+class MultipleFileField(forms.FileField):
+    """FileField that accepts several files and cleans to a list."""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("widget", MultipleFileInput())
+        super().__init__(*args, **kwargs)
+
+    def clean(self, data, initial=None):
+        single_file_clean = super().clean
+        if isinstance(data, (list, tuple)):
+            return [single_file_clean(d, initial) for d in data]
+        return [single_file_clean(data, initial)]
+
+
 class CSVUploadForm(forms.Form):
-    file = forms.FileField(help_text="Upload a CSV file")
+    file = MultipleFileField(help_text="Upload one or more CSV files, or zip archives of CSV files")
@@ -0,0 +1,152 @@
+"""
+Spatial crowding heatmap from pre-aggregated grid cells.
+
+Crowding samples are summed into fixed lat/lon grid cells per hour, at
+several zoom levels (CrowdingCell). Ingest adds each upload's samples to the
+affected cells, so a heatmap request reads only the cells in view and sums
+them over the requested time window.
+"""
+import datetime as dt
+import math
+
+from django.db import connection, transaction
+from django.db.models import Count, F, FloatField, Sum
+from django.db.models.functions import Cast, Floor, TruncHour
+
+from .derivation import get_params
+from .models import CrowdingCell, GPSRecord
+
+# Cell edge in degrees per zoom level (~11 km, ~1.1 km, ~110 m of latitude)
+CELL_SIZES = (0.1, 0.01, 0.001)
+
+# Automatic zoom picks the finest level that covers the view in at most this many cells
+MAX_CELLS = 2500
+
+BULK_BATCH_SIZE = 2000
+
+
+def cell_of(lat, lon, zoom):
+    size = CELL_SIZES[zoom]
+    return math.floor(lon / size), math.floor(lat / size)
+
+
+def hour_of(ts):
+    return ts.astimezone(dt.timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def add_crowding_samples(samples):
+    """
+    Add (timestamp, lat, lon, occupancy_ratio) samples to the grid cells.
+
+    Deltas are summed in memory first, so each affected cell is written once,
+    with an INSERT ... ON CONFLICT DO UPDATE (SQLite 3.24+, PostgreSQL).
+    """
+    deltas = {}
+    for ts, lat, lon, occ in samples:
+        bucket = hour_of(ts)
+        for zoom in range(len(CELL_SIZES)):
+            cx, cy = cell_of(lat, lon, zoom)
+            delta = deltas.setdefault((zoom, bucket, cy, cx), [0, 0.0])
+            delta[0] += 1
+            delta[1] += occ
+    if not deltas:
+        return
+
+    # One upsert that adds to the stored totals, so concurrent uploads touching
+    # the same cell neither collide on the unique constraint nor lose counts
+    qn = connection.ops.quote_name
+    table = qn(CrowdingCell._meta.db_table)
+    adapt = connection.ops.adapt_datetimefield_value
+    rows = [(zoom, adapt(bucket), cy, cx, n, s) for (zoom, bucket, cy, cx), (n, s) in deltas.items()]
+    with connection.cursor() as cursor:
+        for i in range(0, len(rows), BULK_BATCH_SIZE):
+            cursor.executemany(
+                f"""
+                INSERT INTO {table} (zoom, bucket_start, cell_y, cell_x, sample_count, occupancy_sum)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                ON CONFLICT (zoom, bucket_start, cell_y, cell_x) DO UPDATE SET
+                    sample_count = {table}.sample_count + excluded.sample_count,
+                    occupancy_sum = {table}.occupancy_sum + excluded.occupancy_sum
+                """,
+                rows[i:i + BULK_BATCH_SIZE],
+            )
+
+
+def rebuild_heatmap(params=None):
+    """
+    Regenerate every cell from GPS records (after derivation parameters change).
+
+    Runs in one transaction, so readers never see an empty or partial heatmap.
+    """
+    params = params or get_params()
+    occ = F("weight") / float(params["PASSENGER_WEIGHT_KG"]) / Cast("bus__capacity", FloatField())
+    gps = GPSRecord.objects.filter(weight__isnull=False, bus__capacity__gt=0)
+    with transaction.atomic():
+        CrowdingCell.objects.all().delete()
+        for zoom, size in enumerate(CELL_SIZES):
+            rows = (
+                gps.annotate(
+                    bucket=TruncHour("timestamp"),
+                    cx=Floor(F("longitude") / size),
+                    cy=Floor(F("latitude") / size),
+                )
+                .values("bucket", "cx", "cy")
+                .annotate(n=Count("id"), s=Sum(occ))
+                .order_by()
+            )
+            batch = []
+            for row in rows.iterator():
+                batch.append(CrowdingCell(
+                    zoom=zoom, bucket_start=row["bucket"], cell_x=int(row["cx"]), cell_y=int(row["cy"]),
+                    sample_count=row["n"], occupancy_sum=row["s"],
+                ))
+                if len(batch) >= BULK_BATCH_SIZE:
+                    CrowdingCell.objects.bulk_create(batch)
+                    batch = []
+            CrowdingCell.objects.bulk_create(batch)
+
+
+def pick_zoom(min_lat, min_lon, max_lat, max_lon):
+    """Finest zoom level that shows the box in at most MAX_CELLS cells."""
+    for zoom in reversed(range(len(CELL_SIZES))):
+        if count_cells(min_lat, min_lon, max_lat, max_lon, zoom) <= MAX_CELLS:
+            return zoom
+    return 0
+
+
+def count_cells(min_lat, min_lon, max_lat, max_lon, zoom):
+    x0, y0 = cell_of(min_lat, min_lon, zoom)
+    x1, y1 = cell_of(max_lat, max_lon, zoom)
+    return (x1 - x0 + 1) * (y1 - y0 + 1)
+
+
+def cells_in_view(min_lat, min_lon, max_lat, max_lon, zoom, start=None, end=None):
+    """
+    Per-cell sample count and average occupancy for a bounding box.
+
+    start/end select whole hours: a cell-hour is included if its hour
+    starts in [hour_of(start), end].
+    """
+    size = CELL_SIZES[zoom]
+    x0, y0 = cell_of(min_lat, min_lon, zoom)
+    x1, y1 = cell_of(max_lat, max_lon, zoom)
+
+    qs = CrowdingCell.objects.filter(
+        zoom=zoom, cell_x__gte=x0, cell_x__lte=x1, cell_y__gte=y0, cell_y__lte=y1,
+    )
+    if start is not None:
+        qs = qs.filter(bucket_start__gte=hour_of(start))
+    if end is not None:
+        qs = qs.filter(bucket_start__lte=end)
+
+    rows = qs.values("cell_x", "cell_y").annotate(n=Sum("sample_count"), s=Sum("occupancy_sum")).order_by()
+    return [
+        {
+            "lat": round((r["cell_y"] + 0.5) * size, 6),
+            "lon": round((r["cell_x"] + 0.5) * size, 6),
+            "samples": r["n"],
+            "avg_occupancy": round(r["s"] / r["n"], 3),
+        }
+        for r in rows
+        if r["n"]
+    ]
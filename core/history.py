@@ -0,0 +1,181 @@
+"""
+Chunked history export of GPS, crowding and ETA records.
+
+Rows are fetched from the filtered queryset's SQL and converted to pandas
+DataFrames one chunk at a time, then encoded as gzip CSV, Parquet or
+Feather (Arrow IPC). Memory stays bounded by the chunk size however many
+rows match, and every writer yields bytes as it goes so the output can be
+streamed.
+
+pandas is imported here, so views should import this module lazily.
+"""
+import zlib
+
+import pandas as pd
+from django.db import connections
+
+from .models import CrowdingRecord, ETARecord, GPSRecord
+
+CHUNK_SIZE = 100_000
+
+# kind -> (model, timestamp field, [(column, ORM path, pandas dtype)])
+KINDS = {
+    "gps": (GPSRecord, "timestamp", [
+        ("bus_id", "bus__bus_id", "string"),
+        ("timestamp", "timestamp", "datetime64[ns, UTC]"),
+        ("latitude", "latitude", "float64"),
+        ("longitude", "longitude", "float64"),
+        ("speed", "speed", "float64"),
+        ("weight", "weight", "float64"),
+    ]),
+    "crowding": (CrowdingRecord, "timestamp", [
+        ("bus_id", "bus__bus_id", "string"),
+        ("timestamp", "timestamp", "datetime64[ns, UTC]"),
+        ("occupancy_ratio", "occupancy_ratio", "float64"),
+        ("level", "level", "string"),
+    ]),
+    "eta": (ETARecord, "source_timestamp", [
+        ("bus_id", "bus__bus_id", "string"),
+        ("stop_id", "stop__stop_id", "string"),
+        ("source_timestamp", "source_timestamp", "datetime64[ns, UTC]"),
+        ("computed_at", "computed_at", "datetime64[ns, UTC]"),
+        ("eta_seconds", "eta_seconds", "Int64"),
+        ("eta_minutes", "eta_minutes", "float64"),
+        ("distance_m", "distance_m", "float64"),
+    ]),
+}
+
+FORMATS = {
+    "csv.gz": ("application/gzip", "csv.gz"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "feather": ("application/vnd.apache.arrow.file", "feather"),
+}
+
+
+def history_queryset(kind, bus_ids=None, stop_id=None, start=None, end=None):
+    """Filtered values_list over one record kind, in (bus, time) index order."""
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of: {', '.join(KINDS)}")
+    if stop_id and kind != "eta":
+        raise ValueError("stop_id only applies to kind=eta")
+
+    model, ts_field, columns = KINDS[kind]
+    qs = model.objects.all()
+    if bus_ids:
+        qs = qs.filter(bus__bus_id__in=bus_ids)
+    if stop_id:
+        qs = qs.filter(stop__stop_id=stop_id)
+    if start:
+        qs = qs.filter(**{f"{ts_field}__gte": start})
+    if end:
+        qs = qs.filter(**{f"{ts_field}__lte": end})
+    return qs.order_by("bus_id", ts_field, "id").values_list(*(path for _, path, _ in columns))
+
+
+def iter_frames(kind, queryset, chunk_size=CHUNK_SIZE):
+    """
+    Yield DataFrames of at most chunk_size rows with fixed column dtypes.
+
+    The queryset's SQL is read with fetchmany, and values are converted per
+    column by pandas (timestamps in particular) instead of per row by the
+    ORM, which is what makes multi-million-row extracts take seconds.
+    """
+    _, _, columns = KINDS[kind]
+    names = [name for name, _, _ in columns]
+    dtypes = {name: dtype for name, _, dtype in columns}
+    timestamps = [name for name, _, dtype in columns if dtype.startswith("datetime")]
+
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        while True:
+            chunk = cursor.fetchmany(chunk_size)
+            if not chunk:
+                break
+            df = pd.DataFrame.from_records(chunk, columns=names)
+            for name in timestamps:
+                df[name] = pd.to_datetime(df[name], utc=True, format="ISO8601")
+            yield df.astype(dtypes)
+
+
+def empty_frame(kind):
+    _, _, columns = KINDS[kind]
+    return pd.DataFrame({name: pd.Series(dtype=dtype) for name, _, dtype in columns})
+
+
+def export_chunks(kind, fmt, frames):
+    """Encode DataFrames as `fmt` and yield the output bytes chunk by chunk."""
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(FORMATS)}")
+    return _arrow_chunks(kind, fmt, frames)
+
+
+class _ByteSink:
+    """Write-only file object that hands written bytes back to a generator."""
+
+    def __init__(self):
+        self.parts = []
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def _arrow_chunks(kind, fmt, frames):
+    import pyarrow as pa
+
+    schema = pa.Schema.from_pandas(empty_frame(kind), preserve_index=False)
+    sink = _ByteSink()
+    out = pa.PythonFile(sink, mode="w")
+    gz = None
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        writer = pq.ParquetWriter(out, schema)
+    elif fmt == "feather":
+        # Feather v2 is the Arrow IPC file format
+        writer = pa.ipc.new_file(out, schema)
+    else:
+        import pyarrow.csv as pa_csv
+
+        # Arrow's CSV writer is several times faster than DataFrame.to_csv;
+        # microsecond timestamps match what the database stores
+        csv_schema = pa.schema([
+            pa.field(f.name, pa.timestamp("us", tz="UTC")) if pa.types.is_timestamp(f.type) else f
+            for f in schema
+        ])
+        writer = pa_csv.CSVWriter(out, csv_schema)
+        # Level 1: much faster than the default and still ~8x smaller than raw CSV
+        gz = zlib.compressobj(1, zlib.DEFLATED, 31)  # wbits 31: gzip container
+
+    def drain():
+        data = sink.drain()
+        return gz.compress(data) if gz is not None else data
+
+    try:
+        for df in frames:
+            table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+            if gz is not None:
+                table = table.cast(csv_schema)
+            writer.write_table(table)
+            data = drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    data = drain()
+    if gz is not None:
+        data += gz.flush()
+    yield data
@@ -0,0 +1,194 @@
+"""
+CSV ingest for uploads of one or many files.
+
+Files are parsed by core/parsing.py, which has no Django imports so it can
+run in parallel worker processes. The parsed rows of all files are then
+written here in one transaction: either the whole upload is committed or
+none of it is.
+
+  members = read_uploads(uploaded_files)   # CSVs and zip members, in memory
+  parsed = parse_files(members)            # process pool when there are several
+  summaries = ingest(parsed)               # one atomic write, summary per file
+"""
+from django.db import transaction
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+
+from .arrivals import update_stop_arrivals
+from .derivation import crowding_level, eta_estimator, get_params, occupancy_ratio
+from .eta import haversine_m
+from .heatmap import add_crowding_samples
+from .models import Bus, BusStop, CrowdingRecord, ETARecord, GPSRecord
+
+BULK_BATCH_SIZE = 2000
+
+# Stored GPS records per bus replayed into the ETA estimator before an upload,
+# so smoothed speeds carry over from earlier uploads
+SEED_RECORDS = 20
+
+# Buses per seeding query; each adds a term to its WHERE clause, and SQLite
+# caps expression depth at 1000
+SEED_BATCH_SIZE = 200
+
+
+class FileSummary:
+    def __init__(self, parsed):
+        self.name = parsed.name
+        self.total = parsed.total
+        self.skipped = parsed.skipped
+        self.first_error = parsed.first_error
+        self.error = parsed.error
+        self.gps = 0
+        self.crowding = 0
+        self.eta = 0
+
+    def message(self):
+        if self.error:
+            return f"{self.name}: not imported. {self.error}"
+        msg = (
+            f"{self.name}: read {self.total} rows, inserted {self.gps} GPS records, "
+            f"{self.crowding} crowding records, {self.eta} ETA records, skipped {self.skipped} rows."
+        )
+        if self.first_error:
+            msg += f" First error: {self.first_error}"
+        return msg
+
+
+def ingest(parsed_files, params=None):
+    """
+    Write all parsed rows in one transaction and derive crowding/ETA records.
+
+    Rows from every file are merged in timestamp order, so the per-bus ETA
+    estimator sees each bus's records in sequence even when a bus spans files.
+    The estimator is first seeded with each bus's most recent stored records,
+    so ETAs stay available across uploads.
+    Returns one FileSummary per parsed file.
+    """
+    params = params or get_params()
+    summaries = [FileSummary(p) for p in parsed_files]
+    merged = sorted(
+        ((i, row) for i, p in enumerate(parsed_files) for row in p.rows),
+        key=lambda item: item[1][1],
+    )
+    if not merged:
+        return summaries
+
+    with transaction.atomic():
+        buses = _upsert_buses(merged)
+        stops, stop_errors = _upsert_stops(merged)
+
+        estimator = eta_estimator(params)
+        _seed_estimator(estimator, buses, merged)
+        gps_objs, crowding_objs, eta_objs = [], [], []
+        heatmap_samples = []
+        for file_idx, row in merged:
+            bus_id, ts, lat, lon, speed, capacity, weight, stop_id = row[:8]
+            summary = summaries[file_idx]
+            if stop_id in stop_errors:
+                summary.skipped += 1
+                summary.first_error = summary.first_error or stop_errors[stop_id]
+                continue
+
+            bus = buses[bus_id]
+            gps_objs.append(GPSRecord(bus=bus, timestamp=ts, latitude=lat, longitude=lon, speed=speed, weight=weight))
+            summary.gps += 1
+
+            if weight is not None and bus.capacity > 0:
+                occ = occupancy_ratio(weight, bus.capacity, params)
+                crowding_objs.append(CrowdingRecord(
+                    bus=bus, timestamp=ts, occupancy_ratio=occ, level=crowding_level(occ, params),
+                ))
+                heatmap_samples.append((ts, lat, lon, occ))
+                summary.crowding += 1
+
+            estimator.update(bus_id, ts, lat, lon, speed)
+
+            if stop_id:
+                stop = stops[stop_id]
+                distance = haversine_m(lat, lon, stop.latitude, stop.longitude)
+                eta_s = estimator.eta_seconds(bus_id, distance)
+                eta_objs.append(ETARecord(
+                    bus=bus,
+                    stop=stop,
+                    source_timestamp=ts,
+                    eta_seconds=eta_s,
+                    eta_minutes=eta_s / 60.0 if eta_s is not None else None,
+                    distance_m=distance,
+                ))
+                summary.eta += 1
+
+        GPSRecord.objects.bulk_create(gps_objs, batch_size=BULK_BATCH_SIZE)
+        CrowdingRecord.objects.bulk_create(crowding_objs, batch_size=BULK_BATCH_SIZE)
+        ETARecord.objects.bulk_create(eta_objs, batch_size=BULK_BATCH_SIZE)
+        update_stop_arrivals(eta_objs)
+        add_crowding_samples(heatmap_samples)
+
+    return summaries
+
+
+def _seed_estimator(estimator, buses, merged):
+    """
+    Replay each bus's last SEED_RECORDS stored GPS records (older than its
+    first row in this upload) into the estimator, with one windowed query
+    per SEED_BATCH_SIZE buses.
+    """
+    first_ts = {}
+    for _, row in merged:
+        first_ts.setdefault(row[0], row[1])
+
+    items = list(first_ts.items())
+    for i in range(0, len(items), SEED_BATCH_SIZE):
+        before = Q()
+        for bus_id, ts in items[i:i + SEED_BATCH_SIZE]:
+            before |= Q(bus_id=buses[bus_id].pk, timestamp__lt=ts)
+        recent = (
+            GPSRecord.objects.filter(before)
+            .annotate(recency=Window(RowNumber(), partition_by=[F("bus_id")], order_by=F("timestamp").desc()))
+            .filter(recency__lte=SEED_RECORDS)
+            .order_by("timestamp", "id")
+            .values_list("bus__bus_id", "timestamp", "latitude", "longitude", "speed")
+        )
+        estimator.update_many(recent)
+
+
+def _upsert_buses(merged):
+    # The most recent row decides a bus's capacity
+    capacities = {}
+    for _, row in merged:
+        capacities[row[0]] = row[5]
+
+    buses = Bus.objects.in_bulk(list(capacities), field_name="bus_id")
+    missing = [Bus(bus_id=b, capacity=c) for b, c in capacities.items() if b not in buses]
+    Bus.objects.bulk_create(missing, batch_size=BULK_BATCH_SIZE)
+    changed = []
+    for bus_id, capacity in capacities.items():
+        bus = buses.get(bus_id)
+        if bus is not None and bus.capacity != capacity:
+            bus.capacity = capacity
+            changed.append(bus)
+    Bus.objects.bulk_update(changed, ["capacity"], batch_size=BULK_BATCH_SIZE)
+    # re-read so newly created buses have primary keys on every backend
+    return Bus.objects.in_bulk(list(capacities), field_name="bus_id")
+
+
+def _upsert_stops(merged):
+    """Create/update each referenced stop once; returns (stops by id, errors by id)."""
+    latest = {}
+    for _, row in merged:
+        stop_id, stop_name, stop_lat, stop_lon = row[7:11]
+        if not stop_id:
+            continue
+        defaults = latest.setdefault(stop_id, {})
+        defaults["name"] = stop_name
+        if stop_lat is not None:
+            defaults["latitude"] = stop_lat
+            defaults["longitude"] = stop_lon
+
+    stops, errors = {}, {}
+    for stop_id, defaults in latest.items():
+        try:
+            with transaction.atomic():
+                stops[stop_id], _ = BusStop.objects.update_or_create(stop_id=stop_id, defaults=defaults)
+        except Exception as e:
+            errors[stop_id] = f"{type(e).__name__}: {e}"
+    return stops, errors
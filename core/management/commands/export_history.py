@@ -0,0 +1,76 @@
+"""
+Export GPS, crowding or ETA history to a file, chunk by chunk.
+
+Same filters and formats as the /export/history endpoint (see core/history.py).
+
+Usage:
+  python manage.py export_history --kind eta --format parquet --stop S001 \
+      --start 2025-12-15T00:00:00Z --output eta.parquet
+"""
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from core.history import CHUNK_SIZE, FORMATS, KINDS, export_chunks, history_queryset, iter_frames
+
+
+class Command(BaseCommand):
+    help = "Export GPS/crowding/ETA history as gzip CSV, Parquet or Feather with bounded memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--kind", choices=list(KINDS), default="gps")
+        parser.add_argument("--format", choices=list(FORMATS), default="csv.gz", dest="fmt")
+        parser.add_argument("--bus", action="append", dest="bus_ids", metavar="BUS_ID",
+                            help="Only this bus (repeatable)")
+        parser.add_argument("--stop", dest="stop_id", help="Only this stop (kind=eta)")
+        parser.add_argument("--start", help="ISO8601 start of the time window")
+        parser.add_argument("--end", help="ISO8601 end of the time window")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+        parser.add_argument("--output", "-o", required=True, help="Output file, or - for stdout")
+
+    def handle(self, *args, **options):
+        try:
+            qs = history_queryset(
+                options["kind"],
+                bus_ids=options["bus_ids"],
+                stop_id=options["stop_id"],
+                start=_parse(options["start"]),
+                end=_parse(options["end"]),
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        started = time.perf_counter()
+        rows = 0
+
+        def frames():
+            nonlocal rows
+            for df in iter_frames(options["kind"], qs, chunk_size=options["chunk_size"]):
+                rows += len(df)
+                yield df
+
+        chunks = export_chunks(options["kind"], options["fmt"], frames())
+        if options["output"] == "-":
+            for data in chunks:
+                sys.stdout.buffer.write(data)
+            sys.stdout.buffer.flush()
+            return
+
+        with open(options["output"], "wb") as out:
+            for data in chunks:
+                out.write(data)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {rows} {options['kind']} rows to {options['output']} in {elapsed:.1f} s."
+        ))
+
+
+def _parse(raw):
+    if not raw:
+        return None
+    value = parse_datetime(raw.replace("Z", "+00:00"))
+    if value is None:
+        raise CommandError(f"Invalid datetime: {raw}")
+    return value
@@ -0,0 +1,192 @@
+"""
+Rebuild CrowdingRecord/ETARecord from stored GPSRecords using the current
+settings.DERIVATION parameters.
+
+Work is partitioned by bus across worker processes (a single inline worker on
+SQLite, which only allows one writer at a time). Each bus is rebuilt in
+one transaction that also stores a RecomputeProgress row, so an interrupted
+run continues where it stopped when started again with the same parameters.
+
+  - Crowding is regenerated with one INSERT ... SELECT per bus.
+  - ETA is a single streaming pass per bus: GPS rows (in time order) feed the
+    smoothed-speed estimator, and the bus's ETARecords are updated in chunks
+    with executemany. Distances depend only on positions and are kept.
+  - The bus's entries in the per-stop arrivals index are rebuilt.
+  - Once every bus is done, the crowding heatmap cells are rebuilt in one
+    transaction (also when there are no buses left to do, so a run interrupted
+    before this step is completed by the next one).
+
+Usage:
+  python manage.py recompute_derived [--workers N] [--bus 71A ...] [--restart]
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.arrivals import rebuild_stop_arrivals
+from core.derivation import eta_estimator, fingerprint, get_params
+from core.heatmap import rebuild_heatmap
+from core.models import Bus, CrowdingRecord, ETARecord, GPSRecord, RecomputeProgress
+
+CHUNK_SIZE = 20000
+
+
+class Command(BaseCommand):
+    help = "Regenerate crowding and ETA records from stored GPS records with the current derivation parameters."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                            help="Worker processes (default: CPU count; 1 runs inline)")
+        parser.add_argument("--bus", action="append", dest="bus_ids", metavar="BUS_ID",
+                            help="Only recompute this bus (repeatable)")
+        parser.add_argument("--restart", action="store_true",
+                            help="Ignore progress saved by an earlier run with the same parameters")
+
+    def handle(self, *args, **options):
+        params = get_params()
+        params_hash = fingerprint(params)
+
+        # Progress only describes the parameter set records were last rebuilt with;
+        # once that changes, buses done under any other set are out of date again
+        RecomputeProgress.objects.exclude(params_hash=params_hash).delete()
+        if options["restart"]:
+            RecomputeProgress.objects.filter(params_hash=params_hash).delete()
+
+        buses = Bus.objects.exclude(recomputeprogress__params_hash=params_hash)
+        if options["bus_ids"]:
+            buses = buses.filter(bus_id__in=options["bus_ids"])
+        todo = list(buses.order_by("pk").values_list("pk", flat=True))
+        if not todo:
+            self.stdout.write(f"Nothing to do: all buses are up to date for parameters {params_hash}.")
+            # A run interrupted after its last bus never got to the heatmap
+            rebuild_heatmap(params)
+            return
+
+        self.stdout.write(f"Recomputing {len(todo)} buses with parameters {params_hash}...")
+        started = time.perf_counter()
+        total_crowding = total_eta = 0
+
+        workers = max(1, min(options["workers"], len(todo)))
+        if workers > 1 and connection.vendor == "sqlite":
+            # SQLite has a single writer lock, held for a whole bus's transaction;
+            # parallel workers would only queue on it and time out
+            self.stdout.write("SQLite allows one writer at a time; running with 1 worker.")
+            workers = 1
+        if workers == 1:
+            results = (recompute_bus(pk, params, params_hash) for pk in todo)
+            for bus_id, n_crowding, n_eta in results:
+                total_crowding += n_crowding
+                total_eta += n_eta
+                self.stdout.write(f"  {bus_id}: {n_crowding} crowding, {n_eta} ETA")
+        else:
+            # Children must open their own connections
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                futures = [pool.submit(recompute_bus, pk, params, params_hash) for pk in todo]
+                for future in as_completed(futures):
+                    bus_id, n_crowding, n_eta = future.result()
+                    total_crowding += n_crowding
+                    total_eta += n_eta
+                    self.stdout.write(f"  {bus_id}: {n_crowding} crowding, {n_eta} ETA")
+
+        # Grid cells mix buses, so they are rebuilt once all buses are done
+        rebuild_heatmap(params)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Done in {elapsed:.1f} s: {total_crowding} crowding records, {total_eta} ETA records."
+        ))
+
+
+def _init_worker():
+    import django
+
+    django.setup()
+    connections.close_all()
+
+
+def recompute_bus(bus_pk, params, params_hash):
+    """Rebuild one bus's derived records; returns (bus_id, crowding count, ETA count)."""
+    bus = Bus.objects.get(pk=bus_pk)
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            n_crowding = _recompute_crowding(cursor, bus_pk, params)
+            n_eta = _recompute_eta(cursor, bus_pk, params)
+        rebuild_stop_arrivals(bus_pk)
+        RecomputeProgress.objects.create(params_hash=params_hash, bus=bus)
+    return bus.bus_id, n_crowding, n_eta
+
+
+def _recompute_crowding(cursor, bus_pk, params):
+    qn = connection.ops.quote_name
+    crowding_table = qn(CrowdingRecord._meta.db_table)
+    gps_table = qn(GPSRecord._meta.db_table)
+    bus_table = qn(Bus._meta.db_table)
+
+    cursor.execute(f"DELETE FROM {crowding_table} WHERE bus_id = %s", [bus_pk])
+
+    cases = " ".join("WHEN occ < %s THEN %s" for _ in params["CROWDING_LEVELS"])
+    case_params = [v for bound, level in params["CROWDING_LEVELS"] for v in (bound, level)]
+    cursor.execute(
+        f"""
+        INSERT INTO {crowding_table} (bus_id, timestamp, occupancy_ratio, level)
+        SELECT bus_id, timestamp, occ, CASE {cases} ELSE %s END
+        FROM (
+            SELECT g.bus_id AS bus_id, g.timestamp AS timestamp,
+                   (g.weight / %s) / b.capacity AS occ
+            FROM {gps_table} g JOIN {bus_table} b ON b.id = g.bus_id
+            WHERE g.bus_id = %s AND g.weight IS NOT NULL AND b.capacity > 0
+        ) d
+        """,
+        case_params + [params["CROWDING_TOP_LEVEL"], float(params["PASSENGER_WEIGHT_KG"]), bus_pk],
+    )
+    return cursor.rowcount
+
+
+def _recompute_eta(cursor, bus_pk, params):
+    eta_table = connection.ops.quote_name(ETARecord._meta.db_table)
+    estimator = eta_estimator(params)
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+
+    gps_rows = (
+        GPSRecord.objects.filter(bus_id=bus_pk)
+        .order_by("timestamp", "id")
+        .values_list("timestamp", "latitude", "longitude", "speed")
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    pending = next(gps_rows, None)
+
+    # Keyset pages over the bus's ETA rows, so updates never touch an open cursor
+    etas = ETARecord.objects.filter(bus_id=bus_pk).order_by("source_timestamp", "id")
+    last = None
+    updated = 0
+    while True:
+        page = etas
+        if last is not None:
+            page = etas.filter(Q(source_timestamp__gt=last[0]) | Q(source_timestamp=last[0], id__gt=last[1]))
+        rows = list(page.values_list("id", "source_timestamp", "distance_m")[:CHUNK_SIZE])
+        if not rows:
+            break
+
+        batch = []
+        for eta_id, source_ts, distance in rows:
+            while pending is not None and pending[0] <= source_ts:
+                estimator.update(bus_pk, *pending)
+                pending = next(gps_rows, None)
+            eta_s = estimator.eta_seconds(bus_pk, distance)
+            eta_min = eta_s / 60.0 if eta_s is not None else None
+            batch.append((eta_s, eta_min, now, eta_id))
+
+        cursor.executemany(
+            f"UPDATE {eta_table} SET eta_seconds = %s, eta_minutes = %s, computed_at = %s WHERE id = %s",
+            batch,
+        )
+        updated += len(batch)
+        last = (rows[-1][1], rows[-1][0])
+
+    return updated
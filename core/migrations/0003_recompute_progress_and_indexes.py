@@ -0,0 +1,61 @@
+# Generated by Django 6.0 on 2026-10-19 10:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0002_gpsrecord_weight_crowdingrecord_etarecord"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecomputeProgress",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("params_hash", models.CharField(max_length=64)),
+                ("completed_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="crowdingrecord",
+            index=models.Index(
+                fields=["bus", "timestamp"], name="core_crowdi_bus_id_2c253f_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="etarecord",
+            index=models.Index(
+                fields=["bus", "source_timestamp"], name="core_etarec_bus_id_88dcf0_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="gpsrecord",
+            index=models.Index(
+                fields=["bus", "timestamp"], name="core_gpsrec_bus_id_f3e596_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="recomputeprogress",
+            name="bus",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE, to="core.bus"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="recomputeprogress",
+            constraint=models.UniqueConstraint(
+                fields=("params_hash", "bus"), name="unique_recompute_progress"
+            ),
+        ),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 6.0 on 2026-10-19 11:00
+
+import datetime
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_stop_arrivals(apps, schema_editor):
+    """Index the latest existing ETARecord of every (stop, bus) pair."""
+    ETARecord = apps.get_model("core", "ETARecord")
+    StopArrival = apps.get_model("core", "StopArrival")
+
+    latest = {}
+    for eta in ETARecord.objects.order_by("source_timestamp", "id").iterator():
+        latest[(eta.stop_id, eta.bus_id)] = eta
+
+    arrivals = []
+    for (stop_id, bus_id), eta in latest.items():
+        predicted = None
+        if eta.eta_seconds is not None:
+            predicted = eta.source_timestamp + datetime.timedelta(
+                seconds=eta.eta_seconds
+            )
+        arrivals.append(
+            StopArrival(
+                stop_id=stop_id,
+                bus_id=bus_id,
+                eta_record_id=eta.id,
+                source_timestamp=eta.source_timestamp,
+                predicted_arrival=predicted,
+                eta_seconds=eta.eta_seconds,
+                distance_m=eta.distance_m,
+            )
+        )
+    StopArrival.objects.bulk_create(arrivals, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0003_recompute_progress_and_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StopArrival",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("source_timestamp", models.DateTimeField()),
+                ("predicted_arrival", models.DateTimeField(blank=True, null=True)),
+                ("eta_seconds", models.IntegerField(blank=True, null=True)),
+                ("distance_m", models.FloatField(blank=True, null=True)),
+                (
+                    "bus",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="core.bus"
+                    ),
+                ),
+                (
+                    "eta_record",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="core.etarecord"
+                    ),
+                ),
+                (
+                    "stop",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="core.busstop"
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["stop", "predicted_arrival"],
+                        name="core_stopar_stop_id_4c4116_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("stop", "bus"), name="unique_stop_arrival"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_stop_arrivals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,97 @@
+# Generated by Django 6.0 on 2026-10-19 12:00
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, FloatField, Sum
+from django.db.models.functions import Cast, Floor, TruncHour
+
+# Cell edge in degrees per zoom level, as in core/heatmap.py at this migration
+CELL_SIZES = (0.1, 0.01, 0.001)
+
+# Default of core/derivation.py at this migration, used when settings.DERIVATION
+# does not set it
+PASSENGER_WEIGHT_KG = 75.0
+
+
+def backfill_crowding_cells(apps, schema_editor):
+    """Aggregate existing GPS records into grid cells per zoom level and hour."""
+    GPSRecord = apps.get_model("core", "GPSRecord")
+    CrowdingCell = apps.get_model("core", "CrowdingCell")
+
+    derivation = getattr(settings, "DERIVATION", {})
+    passenger_weight = float(derivation.get("PASSENGER_WEIGHT_KG", PASSENGER_WEIGHT_KG))
+    occ = F("weight") / passenger_weight / Cast("bus__capacity", FloatField())
+    gps = GPSRecord.objects.filter(weight__isnull=False, bus__capacity__gt=0)
+    for zoom, size in enumerate(CELL_SIZES):
+        rows = (
+            gps.annotate(
+                bucket=TruncHour("timestamp"),
+                cx=Floor(F("longitude") / size),
+                cy=Floor(F("latitude") / size),
+            )
+            .values("bucket", "cx", "cy")
+            .annotate(n=Count("id"), s=Sum(occ))
+            .order_by()
+        )
+        CrowdingCell.objects.bulk_create(
+            (
+                CrowdingCell(
+                    zoom=zoom,
+                    bucket_start=row["bucket"],
+                    cell_x=int(row["cx"]),
+                    cell_y=int(row["cy"]),
+                    sample_count=row["n"],
+                    occupancy_sum=row["s"],
+                )
+                for row in rows.iterator()
+            ),
+            batch_size=2000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0004_stoparrival"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CrowdingCell",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("zoom", models.PositiveSmallIntegerField()),
+                (
+                    "cell_x",
+                    models.IntegerField(help_text="floor(longitude / cell size)"),
+                ),
+                (
+                    "cell_y",
+                    models.IntegerField(help_text="floor(latitude / cell size)"),
+                ),
+                (
+                    "bucket_start",
+                    models.DateTimeField(help_text="Start of the hour aggregated"),
+                ),
+                ("sample_count", models.PositiveIntegerField(default=0)),
+                ("occupancy_sum", models.FloatField(default=0.0)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("zoom", "bucket_start", "cell_y", "cell_x"),
+                        name="unique_crowding_cell",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_crowding_cells, migrations.RunPython.noop),
+    ]
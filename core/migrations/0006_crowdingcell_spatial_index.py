@@ -0,0 +1,20 @@
+# Generated by Django 6.0 on 2026-10-19 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0005_crowdingcell"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="crowdingcell",
+            index=models.Index(
+                fields=["zoom", "cell_x", "cell_y", "bucket_start"],
+                name="core_crowdi_zoom_758cc8_idx",
+            ),
+        ),
+    ]
@@ -28,6 +28,9 @@ class GPSRecord(models.Model):
     speed = models.FloatField(help_text="Speed in km/h")
     weight = models.FloatField(null=True, blank=True, help_text="Vehicle load weight (kg), optional")
 
+    class Meta:
+        indexes = [models.Index(fields=["bus", "timestamp"])]
+
     def __str__(self):
         return f"{self.bus.bus_id} @ {self.timestamp}"
 
@@ -38,6 +41,9 @@ class CrowdingRecord(models.Model):
     occupancy_ratio = models.FloatField(help_text="Estimated occupancy ratio (0-1+)")
     level = models.CharField(max_length=20)
 
+    class Meta:
+        indexes = [models.Index(fields=["bus", "timestamp"])]
+
     def __str__(self):
         return f"{self.bus.bus_id} {self.level} @ {self.timestamp}"
 
@@ -51,5 +57,75 @@ class ETARecord(models.Model):
     eta_minutes = models.FloatField(null=True, blank=True)
     distance_m = models.FloatField(null=True, blank=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["bus", "source_timestamp"])]
+
     def __str__(self):
         return f"{self.bus.bus_id} -> {self.stop.stop_id} ({self.eta_minutes} min)"
+
+
+class RecomputeProgress(models.Model):
+    """A bus whose derived records were rebuilt for a given parameter set."""
+    params_hash = models.CharField(max_length=64)
+    bus = models.ForeignKey(Bus, on_delete=models.CASCADE)
+    completed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["params_hash", "bus"], name="unique_recompute_progress"),
+        ]
+
+    def __str__(self):
+        return f"{self.bus.bus_id} @ {self.params_hash}"
+
+
+class StopArrival(models.Model):
+    """
+    Latest ETA of each bus for each stop, kept up to date at ingest.
+
+    Serves the stop arrivals board with one indexed query instead of a
+    scan over every bus's ETARecords.
+    """
+    stop = models.ForeignKey(BusStop, on_delete=models.CASCADE)
+    bus = models.ForeignKey(Bus, on_delete=models.CASCADE)
+    eta_record = models.ForeignKey(ETARecord, on_delete=models.CASCADE)
+    source_timestamp = models.DateTimeField()
+    predicted_arrival = models.DateTimeField(null=True, blank=True)
+    eta_seconds = models.IntegerField(null=True, blank=True)
+    distance_m = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["stop", "bus"], name="unique_stop_arrival"),
+        ]
+        indexes = [models.Index(fields=["stop", "predicted_arrival"])]
+
+    def __str__(self):
+        return f"{self.bus.bus_id} -> {self.stop.stop_id} @ {self.predicted_arrival}"
+
+
+class CrowdingCell(models.Model):
+    """
+    Crowding aggregated per lat/lon grid cell and hour, at several zoom levels.
+
+    Updated incrementally at ingest (see core/heatmap.py), so heatmap requests
+    only read the cells in view instead of scanning raw records.
+    """
+    zoom = models.PositiveSmallIntegerField()
+    cell_x = models.IntegerField(help_text="floor(longitude / cell size)")
+    cell_y = models.IntegerField(help_text="floor(latitude / cell size)")
+    bucket_start = models.DateTimeField(help_text="Start of the hour aggregated")
+    sample_count = models.PositiveIntegerField(default=0)
+    occupancy_sum = models.FloatField(default=0.0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["zoom", "bucket_start", "cell_y", "cell_x"], name="unique_crowding_cell",
+            ),
+        ]
+        # Bounding-box reads: the cells in view at one zoom, then their hours
+        indexes = [models.Index(fields=["zoom", "cell_x", "cell_y", "bucket_start"])]
+
+    def __str__(self):
+        return f"z{self.zoom} ({self.cell_x}, {self.cell_y}) @ {self.bucket_start}"
@@ -0,0 +1,170 @@
+"""
+CSV parsing for uploads of one or many files.
+
+Nothing here imports Django or touches the database, so parse_files' worker
+processes can import this module under any multiprocessing start method
+(fork, spawn or forkserver) without an initialised app registry.
+"""
+import csv
+import datetime as dt
+import io
+import math
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+REQUIRED_COLUMNS = {"bus_id", "timestamp", "lat", "lon", "speed", "capacity", "weight"}
+
+# Column limits of the models (core/models.py), checked here so a bad value
+# skips its row instead of failing the whole upload's transaction
+MAX_ID_LENGTH = 50
+MAX_STOP_NAME_LENGTH = 100
+
+# Zip members larger than this (uncompressed) are rejected rather than read into memory
+MAX_MEMBER_BYTES = 200 * 1024 * 1024
+
+
+class UploadFile:
+    """One CSV to ingest: its display name and raw bytes (or a file-level error)."""
+
+    def __init__(self, name, data=None, error=None):
+        self.name = name
+        self.data = data
+        self.error = error
+
+
+class ParsedFile:
+    """Rows parsed from one CSV, plus per-file counters."""
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = []  # tuples, see _parse_row
+        self.total = 0
+        self.skipped = 0
+        self.first_error = None
+        self.error = None  # the whole file was rejected
+
+    def skip(self, message):
+        self.skipped += 1
+        if self.first_error is None:
+            # keep the first error only (avoid spamming)
+            self.first_error = message
+
+
+def read_uploads(uploaded_files):
+    """
+    Expand uploaded files into UploadFile objects.
+
+    .zip archives contribute one UploadFile per .csv member; members are
+    read straight from the archive into memory, never extracted to disk.
+    """
+    members = []
+    for f in uploaded_files:
+        if not f.name.lower().endswith(".zip"):
+            members.append(UploadFile(f.name, f.read()))
+            continue
+        try:
+            with zipfile.ZipFile(f) as zf:
+                for info in zf.infolist():
+                    base = os.path.basename(info.filename)
+                    if info.is_dir() or not base.lower().endswith(".csv") or info.filename.startswith("__MACOSX/"):
+                        continue
+                    name = f"{f.name}/{info.filename}"
+                    if info.file_size > MAX_MEMBER_BYTES:
+                        members.append(UploadFile(name, error="File is too large."))
+                        continue
+                    members.append(UploadFile(name, zf.read(info)))
+        except zipfile.BadZipFile:
+            members.append(UploadFile(f.name, error="Not a valid zip archive."))
+    return members
+
+
+def parse_files(members, workers=None):
+    """Parse UploadFiles into ParsedFiles, across a process pool when there are several."""
+    workers = workers or os.cpu_count() or 1
+    if len(members) < 2 or workers < 2:
+        return [parse_csv(m) for m in members]
+    with ProcessPoolExecutor(max_workers=min(workers, len(members))) as pool:
+        return list(pool.map(parse_csv, members, chunksize=max(1, len(members) // (workers * 4))))
+
+
+def parse_csv(member):
+    """Parse and validate one CSV. Never touches the database."""
+    parsed = ParsedFile(member.name)
+    if member.error:
+        parsed.error = member.error
+        return parsed
+
+    # Decode CSV (utf-8-sig handles Excel BOM cleanly)
+    try:
+        decoded = member.data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        parsed.error = "CSV must be UTF-8 encoded."
+        return parsed
+
+    reader = csv.DictReader(io.StringIO(decoded))
+    if not reader.fieldnames:
+        parsed.error = "CSV file appears to have no header row."
+        return parsed
+
+    # Normalize header whitespace (common gotcha)
+    reader.fieldnames = [fn.strip() for fn in reader.fieldnames]
+    if not REQUIRED_COLUMNS.issubset(set(reader.fieldnames)):
+        parsed.error = "Missing required columns. Need: bus_id,timestamp,lat,lon,speed,capacity,weight"
+        return parsed
+
+    for row in reader:
+        parsed.total += 1
+        try:
+            parsed.rows.append(_parse_row(row))
+        except Exception as e:
+            parsed.skip(f"{type(e).__name__}: {e}")
+    return parsed
+
+
+def _float(row, name):
+    value = float((row.get(name) or "").strip())
+    if not math.isfinite(value):
+        raise ValueError(f"{name} must be a finite number")
+    return value
+
+
+def _parse_row(row):
+    bus_id = (row.get("bus_id") or "").strip()
+    if not bus_id:
+        raise ValueError("empty bus_id")
+    if len(bus_id) > MAX_ID_LENGTH:
+        raise ValueError(f"bus_id longer than {MAX_ID_LENGTH} characters")
+
+    # robust timestamp parse (supports trailing Z); naive times are UTC
+    ts_raw = (row.get("timestamp") or "").strip()
+    if not ts_raw:
+        raise ValueError("empty timestamp")
+    ts = dt.datetime.fromisoformat(ts_raw.replace("Z", "+00:00"))
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=dt.timezone.utc)
+
+    lat = _float(row, "lat")
+    lon = _float(row, "lon")
+    speed = _float(row, "speed")
+    capacity = int(float((row.get("capacity") or "").strip()))
+    if capacity < 0:
+        raise ValueError("capacity must not be negative")
+    weight = _float(row, "weight") if (row.get("weight") or "").strip() != "" else None
+
+    stop_id = (row.get("stop_id") or "").strip()
+    stop_name = stop_lat = stop_lon = None
+    if stop_id:
+        if len(stop_id) > MAX_ID_LENGTH:
+            raise ValueError(f"stop_id longer than {MAX_ID_LENGTH} characters")
+        stop_name = (row.get("stop_name") or stop_id).strip()
+        if len(stop_name) > MAX_STOP_NAME_LENGTH:
+            raise ValueError(f"stop_name longer than {MAX_STOP_NAME_LENGTH} characters")
+        # If stop_lat/stop_lon missing, keep previous values if stop exists
+        stop_lat_raw = (row.get("stop_lat") or "").strip()
+        stop_lon_raw = (row.get("stop_lon") or "").strip()
+        if stop_lat_raw != "" and stop_lon_raw != "":
+            stop_lat = _float(row, "stop_lat")
+            stop_lon = _float(row, "stop_lon")
+
+    return (bus_id, ts, lat, lon, speed, capacity, weight, stop_id, stop_name, stop_lat, stop_lon)
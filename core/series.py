@@ -0,0 +1,116 @@
+"""
+Chart series engine for the dashboard.
+
+Raw records arrive at different times for each bus, so plotting them
+against one bus's timestamps misplaces every other bus. This module puts
+all buses onto a shared time grid and then thins each series with LTTB
+(Largest-Triangle-Three-Buckets) so the chart payload is bounded by a
+point budget no matter how long the selected window is.
+"""
+import numpy as np
+import pandas as pd
+
+# The shared grid is finer than the point budget so LTTB still has
+# real shape to choose from after bucketing.
+GRID_OVERSAMPLE = 4
+
+
+def lttb_indices(x, y, threshold):
+    """
+    Return the indices of the points kept by LTTB downsampling.
+
+    x must be increasing. The first and last points are always kept.
+    If there are no more than `threshold` points, all indices are returned.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold >= n or n <= 2:
+        return np.arange(n)
+    if threshold < 3:
+        return np.array([0, n - 1])
+
+    # Bucket boundaries for the n - 2 interior points
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    keep = np.empty(threshold, dtype=int)
+    keep[0] = 0
+    keep[-1] = n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point for the final bucket)
+        nlo, nhi = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[nlo:nhi].mean()
+        avg_y = y[nlo:nhi].mean()
+
+        # Triangle area (x2) between point a, each candidate, and the next average
+        area = np.abs(
+            (x[a] - avg_x) * (y[lo:hi] - y[a])
+            - (x[a] - x[lo:hi]) * (avg_y - y[a])
+        )
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+
+    return keep
+
+
+def series_frame(rows):
+    """Build the (bus_id, timestamp, value) frame align_series expects from query rows."""
+    return pd.DataFrame.from_records(list(rows), columns=["bus_id", "timestamp", "value"])
+
+
+def align_series(df, max_points, start=None, end=None):
+    """
+    Resample per-bus values onto one time grid and downsample each bus with LTTB.
+
+    df: DataFrame with columns bus_id, timestamp, value (any order, NaN allowed).
+    Returns {"labels": [iso timestamps], "series": {bus_id: [value or None]}},
+    where every series has one entry per label.
+    """
+    df = df.dropna(subset=["value"])
+    if df.empty:
+        return {"labels": [], "series": {}}
+
+    ts = pd.to_datetime(df["timestamp"], utc=True)
+    t0 = pd.Timestamp(start) if start is not None else ts.min()
+    t1 = pd.Timestamp(end) if end is not None else ts.max()
+
+    grid_size = max(1, int(max_points) * GRID_OVERSAMPLE)
+    span_ns = max(0, (t1 - t0).value)
+    step_ns = max(1, -(-span_ns // grid_size)) if span_ns else 1
+    n_buckets = span_ns // step_ns + 1
+
+    bucket = (ts.astype("int64").to_numpy() - t0.value) // step_ns
+    in_range = (bucket >= 0) & (bucket < n_buckets)
+
+    # bucket x bus matrix of mean values (NaN where a bus has no sample)
+    grid = (
+        pd.DataFrame({
+            "bus_id": df["bus_id"].to_numpy()[in_range],
+            "bucket": bucket[in_range],
+            "value": df["value"].to_numpy(dtype=float)[in_range],
+        })
+        .groupby(["bucket", "bus_id"])["value"]
+        .mean()
+        .unstack("bus_id")
+        .sort_index()
+    )
+
+    keep = set()
+    for bus_id in grid.columns:
+        col = grid[bus_id].dropna()
+        idx = lttb_indices(col.index.to_numpy(), col.to_numpy(), max_points)
+        keep.update(col.index.to_numpy()[idx].tolist())
+
+    rows = sorted(keep)
+    grid = grid.loc[rows]
+    labels = [
+        (t0 + pd.Timedelta(int(b) * step_ns, unit="ns")).isoformat()
+        for b in rows
+    ]
+    series = {
+        str(bus_id): [None if pd.isna(v) else round(float(v), 3) for v in grid[bus_id]]
+        for bus_id in grid.columns
+    }
+    return {"labels": labels, "series": series}
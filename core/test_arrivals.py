@@ -0,0 +1,49 @@
+import datetime as dt
+
+import pytest
+
+from core.arrivals import arrivals_for_stop
+from core.models import StopArrival
+
+ROWS = (
+    "71A,2025-12-15T01:00:00Z,40.4400,-79.9440,36.0,60,2100,S001,Gates Center,40.4440,-79.9440\n"
+    "71A,2025-12-15T01:00:10Z,40.4409,-79.9440,36.0,60,2100,S001,Gates Center,40.4440,-79.9440\n"
+    "P3,2025-12-15T01:00:05Z,40.4430,-79.9440,36.0,50,1500,S001,Gates Center,40.4440,-79.9440\n"
+    "P3,2025-12-15T01:00:05Z,40.4430,-79.9440,36.0,50,1500,S002,Tepper,40.4410,-79.9490\n"
+)
+UPLOADED_AT = dt.datetime(2025, 12, 15, 1, 0, 30, tzinfo=dt.timezone.utc)
+
+
+@pytest.fixture
+def uploaded(uploaded, monkeypatch):
+    monkeypatch.setattr("django.utils.timezone.now", lambda: UPLOADED_AT)
+
+
+def test_index_keeps_latest_eta_per_bus_and_stop(uploaded):
+    assert StopArrival.objects.count() == 3
+    latest = StopArrival.objects.get(stop__stop_id="S001", bus__bus_id="71A")
+    assert latest.source_timestamp == dt.datetime(2025, 12, 15, 1, 0, 10, tzinfo=dt.timezone.utc)
+    assert latest.predicted_arrival == latest.source_timestamp + dt.timedelta(seconds=latest.eta_seconds)
+
+
+def test_arrivals_endpoint_orders_by_predicted_arrival(client, uploaded, django_assert_max_num_queries):
+    with django_assert_max_num_queries(1):
+        resp = client.get("/api/stops/S001/arrivals/")
+    assert resp.status_code == 200
+    assert [a["bus_id"] for a in resp.json()["arrivals"]] == ["P3", "71A"]
+
+
+def test_stale_arrivals_are_left_out(uploaded, settings):
+    settings.ARRIVALS_GRACE_SECONDS = 60
+    later = UPLOADED_AT + dt.timedelta(minutes=2)
+    assert arrivals_for_stop("S001", 10, now=later) == []
+
+    StopArrival.objects.filter(bus__bus_id="P3").update(predicted_arrival=None, eta_seconds=None)
+    # an unknown ETA stays listed while the bus reported recently
+    assert [a.bus.bus_id for a in arrivals_for_stop("S001", 10, now=UPLOADED_AT)] == ["71A", "P3"]
+    assert [a.bus.bus_id for a in arrivals_for_stop("S001", 10, now=later)] == []
+
+
+@pytest.mark.django_db
+def test_arrivals_endpoint_unknown_stop(client):
+    assert client.get("/api/stops/NOPE/arrivals/").status_code == 404
@@ -0,0 +1,50 @@
+import datetime as dt
+
+import pytest
+
+from core.eta import ETAEstimator
+from core.models import ETARecord
+
+
+def test_eta_holds_steady_while_stopped():
+    est = ETAEstimator()
+    t0 = dt.datetime(2025, 12, 15, 1, 0, tzinfo=dt.timezone.utc)
+    lat = 40.4400
+    for i in range(6):
+        est.update("71A", t0 + dt.timedelta(seconds=10 * i), lat, -79.9436, 36.0)
+        lat += 0.0009  # ~100 m per 10 s
+    moving_eta = est.eta_seconds("71A", 1000.0)
+
+    # dwell at a stop for two minutes
+    for i in range(6, 18):
+        est.update("71A", t0 + dt.timedelta(seconds=10 * i), lat, -79.9436, 0.0)
+    assert est.eta_seconds("71A", 1000.0) == moving_eta
+    assert moving_eta == pytest.approx(100, abs=2)
+
+
+def test_unknown_bus_has_no_eta():
+    assert ETAEstimator().eta_seconds("nope", 500.0) is None
+
+
+def test_upload_records_eta_for_stopped_bus(upload):
+    upload(
+        "71A,2025-12-15T01:00:00Z,40.4433,-79.9436,22.5,60,2100,S001,Gates Center,40.4440,-79.9440\n"
+        "71A,2025-12-15T01:00:30Z,40.4435,-79.9436,0.0,60,2100,S001,Gates Center,40.4440,-79.9440\n"
+    )
+    etas = list(ETARecord.objects.order_by("source_timestamp"))
+    assert len(etas) == 2
+    assert all(e.eta_seconds is not None for e in etas)
+
+
+def test_eta_carries_over_between_uploads(client, upload, monkeypatch):
+    monkeypatch.setattr("django.utils.timezone.now", lambda: dt.datetime(2025, 12, 15, 1, 1, tzinfo=dt.timezone.utc))
+    moving = "71A,2025-12-15T01:00:00Z,40.4400,-79.9440,36.0,60,2100,S001,Gates Center,40.4440,-79.9440\n"
+    stopped = "71A,2025-12-15T01:00:10Z,40.4409,-79.9440,0.0,60,2100,S001,Gates Center,40.4440,-79.9440\n"
+    upload(moving)
+    upload(stopped, name="b.csv")
+
+    etas = list(ETARecord.objects.order_by("source_timestamp").values_list("eta_seconds", flat=True))
+    assert etas[1] is not None
+    assert etas[1] == pytest.approx(34, abs=2)  # ~344 m left at the 10 m/s seen in upload 1
+    arrivals = client.get("/api/stops/S001/arrivals/").json()["arrivals"]
+    assert arrivals[0]["eta_seconds"] == etas[1]
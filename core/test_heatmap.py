@@ -0,0 +1,49 @@
+import pytest
+from django.core.management import call_command
+
+from core.models import CrowdingCell
+
+ROWS = (
+    "71A,2025-12-15T01:00:00Z,40.4433,-79.9436,22.5,60,2250,,,,\n"  # occ 0.5
+    "71A,2025-12-15T01:10:00Z,40.4435,-79.9439,21.0,60,4500,,,,\n"  # occ 1.0
+    "P3,2025-12-15T03:00:30Z,40.4000,-79.9000,18.2,50,1500,,,,\n"
+)
+BBOX = "-79.95,40.44,-79.94,40.45"
+
+
+def test_heatmap_returns_cells_in_view(client, uploaded):
+    resp = client.get("/api/heatmap/", {"bbox": BBOX, "zoom": 1})
+    assert resp.status_code == 200
+    cells = resp.json()["cells"]
+    assert len(cells) == 1
+    assert cells[0]["samples"] == 2
+    assert cells[0]["avg_occupancy"] == pytest.approx(0.75)
+
+
+def test_heatmap_time_window_and_validation(client, uploaded):
+    resp = client.get("/api/heatmap/", {"bbox": BBOX, "start": "2025-12-15T02:00:00Z"})
+    assert resp.json()["cells"] == []
+    assert client.get("/api/heatmap/", {"bbox": "nope"}).status_code == 400
+    assert client.get("/api/heatmap/", {"bbox": "nan,40,-79,41"}).status_code == 400
+    assert client.get("/api/heatmap/", {"bbox": "-80,40,inf,41"}).status_code == 400
+    assert client.get("/api/heatmap/", {"bbox": "-180,-90,180,90", "zoom": 2}).status_code == 400
+
+
+def test_rebuild_matches_incremental_cells(uploaded):
+    def snapshot():
+        return sorted(
+            (c.zoom, c.bucket_start, c.cell_x, c.cell_y, c.sample_count, round(c.occupancy_sum, 9))
+            for c in CrowdingCell.objects.all()
+        )
+
+    incremental = snapshot()
+    call_command("recompute_derived", workers=1)
+    assert snapshot() == incremental
+
+
+def test_uploads_add_to_existing_cells(client, upload, uploaded):
+    upload(ROWS, name="b.csv")
+    cells = client.get("/api/heatmap/", {"bbox": BBOX, "zoom": 1}).json()["cells"]
+    assert cells[0]["samples"] == 4
+    assert cells[0]["avg_occupancy"] == pytest.approx(0.75)
+    assert CrowdingCell.objects.filter(zoom=2).count() == 2
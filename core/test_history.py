@@ -0,0 +1,44 @@
+import gzip
+import io
+
+import pandas as pd
+import pytest
+from django.core.management import call_command
+
+ROWS = (
+    "71A,2025-12-15T01:00:00Z,40.4433,-79.9436,22.5,60,2100,S001,Gates Center,40.4440,-79.9440\n"
+    "71A,2025-12-15T01:01:00Z,40.4435,-79.9439,21.0,60,,S001,Gates Center,40.4440,-79.9440\n"
+    "P3,2025-12-15T01:00:30Z,40.4400,-79.9500,18.2,50,1500,S002,Tepper,40.4410,-79.9490\n"
+)
+
+
+def test_history_csv_gz_is_streamed_and_filtered(client, uploaded):
+    resp = client.get("/export/history", {"kind": "gps", "bus_id": "71A"})
+    assert resp.status_code == 200
+    assert resp.streaming
+    df = pd.read_csv(io.BytesIO(gzip.decompress(b"".join(resp.streaming_content))))
+    assert list(df["bus_id"]) == ["71A", "71A"]
+    assert df["weight"].isna().tolist() == [False, True]
+
+
+@pytest.mark.parametrize("fmt, reader", [("parquet", pd.read_parquet), ("feather", pd.read_feather)])
+def test_history_columnar_formats(client, uploaded, fmt, reader):
+    resp = client.get("/export/history", {"kind": "eta", "format": fmt, "stop_id": "S001"})
+    df = reader(io.BytesIO(b"".join(resp.streaming_content)))
+    assert len(df) == 2
+    assert set(df["stop_id"]) == {"S001"}
+    assert str(df["source_timestamp"].dtype) == "datetime64[ns, UTC]"
+
+
+def test_history_rejects_bad_filters(client, db):
+    assert client.get("/export/history", {"kind": "gps", "stop_id": "S001"}).status_code == 400
+    assert client.get("/export/history", {"format": "xls"}).status_code == 400
+    assert client.get("/export/history", {"start": "yesterday"}).status_code == 400
+    assert client.get("/export/history", {"end": "2025-13-45T00:00:00Z"}).status_code == 400
+
+
+def test_export_history_command_in_chunks(uploaded, tmp_path):
+    out = tmp_path / "crowding.parquet"
+    call_command("export_history", kind="crowding", fmt="parquet", chunk_size=1, output=str(out))
+    df = pd.read_parquet(out)
+    assert list(df["bus_id"]) == ["71A", "P3"]
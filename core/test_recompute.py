@@ -0,0 +1,77 @@
+import datetime as dt
+
+import pytest
+from django.core.management import call_command
+
+from core.arrivals import rebuild_stop_arrivals
+from core.models import Bus, BusStop, CrowdingCell, CrowdingRecord, ETARecord, GPSRecord, StopArrival
+
+
+@pytest.fixture
+def history(db):
+    bus = Bus.objects.create(bus_id="71A", capacity=60)
+    stop = BusStop.objects.create(stop_id="S001", name="Gates Center", latitude=40.4440, longitude=-79.9440)
+    t0 = dt.datetime(2025, 12, 15, 1, 0, tzinfo=dt.timezone.utc)
+    for i, speed in enumerate([36.0, 36.0, 0.0]):
+        ts = t0 + dt.timedelta(seconds=10 * i)
+        GPSRecord.objects.create(bus=bus, timestamp=ts, latitude=40.4400 + 0.0009 * i,
+                                 longitude=-79.9440, speed=speed, weight=3000)
+        ETARecord.objects.create(bus=bus, stop=stop, source_timestamp=ts, distance_m=1000.0)
+    return bus
+
+
+def test_recompute_uses_current_parameters(history, settings):
+    settings.DERIVATION = {**settings.DERIVATION, "PASSENGER_WEIGHT_KG": 50.0}
+    call_command("recompute_derived", workers=1)
+
+    levels = set(CrowdingRecord.objects.values_list("level", flat=True))
+    assert CrowdingRecord.objects.count() == 3
+    assert levels == {"OVERCROWDED"}  # 3000 / 50 = 60 passengers on a 60-seat bus
+    etas = list(ETARecord.objects.order_by("source_timestamp").values_list("eta_seconds", flat=True))
+    assert etas == [100, 100, 100]
+
+
+def test_recompute_resumes_and_restarts(history, capsys):
+    call_command("recompute_derived", workers=1)
+    call_command("recompute_derived", workers=1)
+    assert "Nothing to do" in capsys.readouterr().out
+    assert CrowdingRecord.objects.count() == 3
+
+    call_command("recompute_derived", workers=1, restart=True)
+    assert CrowdingRecord.objects.count() == 3
+
+
+def test_recompute_runs_inline_on_sqlite(history, capsys):
+    Bus.objects.create(bus_id="28X", capacity=60)
+    call_command("recompute_derived", workers=4)
+    assert "running with 1 worker" in capsys.readouterr().out
+    assert CrowdingRecord.objects.count() == 3
+
+
+def test_rerun_completes_interrupted_heatmap_rebuild(history):
+    call_command("recompute_derived", workers=1)
+    cells = CrowdingCell.objects.count()
+    assert cells > 0
+
+    CrowdingCell.objects.all().delete()  # as if interrupted before the heatmap step
+    call_command("recompute_derived", workers=1)
+    assert CrowdingCell.objects.count() == cells
+
+
+def test_switching_back_to_earlier_parameters_recomputes(history, settings):
+    defaults = settings.DERIVATION
+    call_command("recompute_derived", workers=1)
+    settings.DERIVATION = {**defaults, "PASSENGER_WEIGHT_KG": 40.0}
+    call_command("recompute_derived", workers=1)
+    assert set(CrowdingRecord.objects.values_list("level", flat=True)) == {"OVERCROWDED"}
+
+    settings.DERIVATION = defaults
+    call_command("recompute_derived", workers=1)
+    assert set(CrowdingRecord.objects.values_list("level", flat=True)) == {"MEDIUM"}
+
+
+def test_recompute_rebuilds_arrivals_index(history, django_assert_max_num_queries):
+    with django_assert_max_num_queries(4):
+        rebuild_stop_arrivals(history.pk)
+    arrival = StopArrival.objects.get(bus=history)
+    assert arrival.source_timestamp == ETARecord.objects.order_by("-source_timestamp").first().source_timestamp
@@ -0,0 +1,57 @@
+import datetime as dt
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.models import Bus, CrowdingRecord
+from core.series import align_series, lttb_indices
+
+
+def test_lttb_keeps_endpoints_and_budget():
+    x = np.arange(1000)
+    y = np.sin(x / 50.0)
+    idx = lttb_indices(x, y, 100)
+    assert len(idx) == 100
+    assert idx[0] == 0 and idx[-1] == 999
+    assert np.all(np.diff(idx) > 0)
+
+
+def test_align_series_places_each_bus_at_its_own_times():
+    t = pd.Timestamp("2025-12-15T01:00:00Z")
+    df = pd.DataFrame({
+        "bus_id": ["A", "A", "B"],
+        "timestamp": [t, t + pd.Timedelta(minutes=10), t + pd.Timedelta(minutes=5)],
+        "value": [0.1, 0.3, 0.9],
+    })
+    out = align_series(df, max_points=50)
+    assert len(out["labels"]) == 3
+    assert out["series"]["A"] == [0.1, None, 0.3]
+    assert out["series"]["B"] == [None, 0.9, None]
+    assert pd.Timestamp(out["labels"][1]) == t + pd.Timedelta(minutes=5)
+
+
+@pytest.mark.django_db
+def test_dashboard_chart_payload_is_bounded(client):
+    bus = Bus.objects.create(bus_id="71A", capacity=60)
+    t0 = dt.datetime(2025, 12, 15, tzinfo=dt.timezone.utc)
+    CrowdingRecord.objects.bulk_create([
+        CrowdingRecord(bus=bus, timestamp=t0 + dt.timedelta(seconds=i), occupancy_ratio=i / 1000, level="LOW")
+        for i in range(1000)
+    ])
+    resp = client.get("/dashboard/?points=50")
+    assert resp.status_code == 200
+    assert len(resp.context["chart_labels_json"].split(",")) <= 50
+
+
+@pytest.mark.django_db
+def test_dashboard_defaults_to_last_day(client):
+    bus = Bus.objects.create(bus_id="71A", capacity=60)
+    newest = dt.datetime(2025, 12, 15, 12, tzinfo=dt.timezone.utc)
+    for age in (dt.timedelta(days=3), dt.timedelta(hours=2), dt.timedelta(0)):
+        CrowdingRecord.objects.create(bus=bus, timestamp=newest - age, occupancy_ratio=0.5, level="MEDIUM")
+    resp = client.get("/dashboard/")
+    labels = json.loads(resp.context["chart_labels_json"])
+    assert len(labels) == 2
+    assert pd.Timestamp(labels[0]) >= pd.Timestamp(newest) - pd.Timedelta(hours=24)
@@ -0,0 +1,48 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# Cold start budget for one worker: fresh interpreter -> first response to "/".
+# Measured at ~0.5 s locally; the margin absorbs slow CI machines.
+STARTUP_BUDGET_S = 2.0
+
+LAZY_MODULES = {"pandas", "numpy", "openpyxl"}
+
+PROBE = """
+import sys, time
+t0 = time.perf_counter()
+from wsgiref.util import setup_testing_defaults
+from config.wsgi import application
+environ = {}
+setup_testing_defaults(environ)
+environ["HTTP_HOST"] = "localhost"
+statuses = []
+b"".join(application(environ, lambda status, headers: statuses.append(status)))
+print(time.perf_counter() - t0, statuses[0])
+"""
+
+
+def _run_probe(*flags):
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE="config.settings")
+    return subprocess.run(
+        [sys.executable, *flags, "-c", PROBE],
+        cwd=Path(__file__).resolve().parent.parent,
+        env=env, capture_output=True, text=True, check=True,
+    )
+
+
+def test_worker_startup_skips_heavy_imports():
+    proc = _run_probe("-X", "importtime")
+    imported = {
+        line.split("|")[-1].strip().split(".")[0]
+        for line in proc.stderr.splitlines()
+        if line.startswith("import time:")
+    }
+    assert not (imported & LAZY_MODULES)
+
+
+def test_time_to_first_response_within_budget():
+    elapsed, status = _run_probe().stdout.split(maxsplit=1)
+    assert status.startswith("200")
+    assert float(elapsed) < STARTUP_BUDGET_S
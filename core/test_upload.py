@@ -0,0 +1,97 @@
+import io
+import os
+import subprocess
+import sys
+import zipfile
+from pathlib import Path
+
+import pytest
+from django.contrib.messages import get_messages
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from core.models import Bus, ETARecord, GPSRecord
+
+
+def _csv(bus_id, minute, speed=22.5):
+    return (
+        f"{bus_id},2025-12-15T01:{minute:02d}:00Z,40.4433,-79.9436,{speed},60,2100,"
+        "S001,Gates Center,40.4440,-79.9440\n"
+    )
+
+
+def _zip(members):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    return SimpleUploadedFile("depot.zip", buf.getvalue(), content_type="application/zip")
+
+
+@pytest.mark.django_db
+def test_zip_upload_reports_each_file(client, csv_file):
+    archive = _zip({
+        "71A.csv": csv_file("71A.csv", _csv("71A", 0) + _csv("71A", 1, speed=0.0)).read(),
+        "P3.csv": csv_file("P3.csv", _csv("P3", 0) + "P3,not-a-time,1,2,3,60,,,,,\n").read(),
+        "bad.csv": "foo,bar\n1,2\n",
+        "readme.txt": "ignored",
+    })
+    resp = client.post("/upload/", {"file": archive})
+    msgs = [str(m) for m in get_messages(resp.wsgi_request)]
+
+    assert GPSRecord.objects.count() == 3
+    assert ETARecord.objects.filter(eta_seconds__isnull=True).count() == 0
+    assert any(m.startswith("Upload complete. 2 of 3 files imported") for m in msgs)
+    assert any(m.startswith("depot.zip/P3.csv: read 2 rows") and "skipped 1 rows" in m for m in msgs)
+    assert any(m.startswith("depot.zip/bad.csv: not imported. Missing required columns") for m in msgs)
+
+
+@pytest.mark.django_db
+def test_multiple_csv_files_are_merged_into_one_ingest(client, csv_file, settings):
+    settings.UPLOAD_PARSE_WORKERS = 2
+    files = [csv_file("a.csv", _csv("71A", 0)), csv_file("b.csv", _csv("71A", 1))]
+    client.post("/upload/", {"file": files})
+    assert Bus.objects.count() == 1
+    assert GPSRecord.objects.count() == 2
+
+
+SPAWN_PROBE = """
+import multiprocessing, sys
+from core.parsing import UploadFile, parse_files
+if __name__ == "__main__":
+    multiprocessing.set_start_method("spawn")
+    header = b"bus_id,timestamp,lat,lon,speed,capacity,weight\\n"
+    row = b"71A,2025-12-15T01:00:00Z,40.4433,-79.9436,22.5,60,2100\\n"
+    parsed = parse_files([UploadFile(f"{i}.csv", header + row) for i in range(4)], workers=2)
+    print(sum(len(p.rows) for p in parsed), "django" in sys.modules)
+"""
+
+
+def test_parse_files_works_with_spawned_workers(tmp_path):
+    # Spawned workers re-import the parsing module without Django being set up
+    probe = tmp_path / "probe.py"
+    probe.write_text(SPAWN_PROBE)
+    env = dict(os.environ, PYTHONPATH=str(Path(__file__).resolve().parent.parent))
+    env.pop("DJANGO_SETTINGS_MODULE", None)
+    proc = subprocess.run([sys.executable, str(probe)], env=env, capture_output=True, text=True, check=True)
+    assert proc.stdout.split() == ["4", "False"]
+
+
+def test_upload_with_a_thousand_buses(upload):
+    upload("".join(_csv(f"B{i:04d}", 0) for i in range(1200)), name="depot.csv")
+    assert GPSRecord.objects.count() == 1200
+
+
+@pytest.mark.django_db
+def test_bad_values_skip_their_row_only(client, csv_file):
+    good = csv_file("a.csv", _csv("71A", 0))
+    bad = csv_file("b.csv", (
+        _csv("P3", 1)
+        + "P3,2025-12-15T01:02:00Z,40.4433,-79.9436,20.0,-5,2100,,,,\n"
+        + "P3,2025-12-15T01:03:00Z,nan,-79.9436,20.0,50,2100,,,,\n"
+        + "P3,2025-12-15T01:04:00Z,40.4433,-79.9436,20.0,50,inf,,,,\n"
+    ))
+    resp = client.post("/upload/", {"file": [good, bad]}, follow=True)
+    assert GPSRecord.objects.count() == 2
+    text = " ".join(str(m) for m in get_messages(resp.wsgi_request))
+    assert "b.csv: read 4 rows" in text and "skipped 3 rows" in text
+    assert "capacity must not be negative" in text
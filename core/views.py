@@ -1,27 +1,43 @@
-import csv
-import math
 import datetime as dt
-import io
+import math
+from django.conf import settings
 from django.contrib import messages
 from django.shortcuts import render, redirect
 from django.utils.dateparse import parse_datetime
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.db.models import OuterRef, Subquery
-from openpyxl import Workbook
 
 from .forms import CSVUploadForm
 from .models import Bus, BusStop, GPSRecord, CrowdingRecord, ETARecord
+from .arrivals import arrivals_for_stop
+from .heatmap import CELL_SIZES, MAX_CELLS, cells_in_view, count_cells, pick_zoom
+from .ingest import ingest
+from .parsing import parse_files, read_uploads
 import json
 from django.db.models import Max
 
+# Heavy dependencies (pandas/NumPy for chart series and history export, openpyxl for XLSX) are
+# imported inside the views that need them, so worker startup does not pay for them.
+
+# Per-bus point budget for dashboard charts (roughly one point per few pixels)
+DEFAULT_CHART_POINTS = 200
+MAX_CHART_POINTS = 2000
+
+# Chart window when no start is given, so page loads don't scale with total history
+DEFAULT_CHART_WINDOW = dt.timedelta(hours=24)
+
+# Arrivals board size
+DEFAULT_ARRIVALS = 10
+MAX_ARRIVALS = 50
+
 def home(request):
     return render(request, "core/home.html")
 
 
 def upload_csv(request):
     """
-    Upload a CSV and insert rows into Bus/BusStop/GPSRecord,
-    and derive CrowdingRecord + ETARecord.
+    Upload one or more CSVs (or zip archives of CSVs) and insert rows into
+    Bus/BusStop/GPSRecord, and derive CrowdingRecord + ETARecord.
 
     Expected CSV header (case-sensitive):
       bus_id,timestamp,lat,lon,speed,capacity,weight,stop_id,stop_name,stop_lat,stop_lon
@@ -31,163 +47,43 @@ def upload_csv(request):
 
     Notes:
       - timestamp supports ISO8601 with 'Z', e.g. 2025-12-15T01:00:00Z
-      - weight is in kg; crowding uses 75 kg/person as a simple assumption
+      - weight is in kg; crowding uses settings.DERIVATION (75 kg/person by default)
       - ETA is computed only if stop_id exists AND the stop exists in DB (created/updated from CSV row)
+      - ETA uses a smoothed per-bus speed (see core/eta.py), so it stays available while a bus is stopped
+      - zip members are read in memory and files are parsed in parallel (see core/parsing.py);
+        all files are committed together, and the summary is reported per file
     """
     if request.method == "POST":
         form = CSVUploadForm(request.POST, request.FILES)
         if form.is_valid():
-            f = form.cleaned_data["file"]
-
-            # Decode CSV (utf-8-sig handles Excel BOM cleanly)
-            try:
-                decoded = f.read().decode("utf-8-sig")
-            except UnicodeDecodeError:
-                messages.error(request, "CSV must be UTF-8 encoded.")
+            members = read_uploads(form.cleaned_data["file"])
+            if not members:
+                messages.error(request, "No CSV files found in the upload.")
                 return redirect("upload_csv")
 
-            reader = csv.DictReader(io.StringIO(decoded))
-
-            required = {"bus_id", "timestamp", "lat", "lon", "speed", "capacity", "weight"}
-            if not reader.fieldnames:
-                messages.error(request, "CSV file appears to have no header row.")
+            try:
+                parsed = parse_files(members, workers=settings.UPLOAD_PARSE_WORKERS)
+                summaries = ingest(parsed)
+            except Exception as e:
+                messages.error(request, f"Upload failed, nothing was saved. {type(e).__name__}: {e}")
                 return redirect("upload_csv")
 
-            # Normalize header whitespace (common gotcha)
-            fieldnames = [fn.strip() for fn in reader.fieldnames]
-            if set(fieldnames) != set(reader.fieldnames):
-                # Rebuild reader with stripped headers
-                reader = csv.DictReader(io.StringIO(decoded))
-                reader.fieldnames = fieldnames
-
-            if not required.issubset(set(reader.fieldnames)):
-                messages.error(
+            imported = [s for s in summaries if not s.error]
+            if len(summaries) > 1:
+                messages.success(
                     request,
-                    "Missing required columns. Need: bus_id,timestamp,lat,lon,speed,capacity,weight",
+                    f"Upload complete. {len(imported)} of {len(summaries)} files imported: "
+                    f"read {sum(s.total for s in imported)} rows, inserted {sum(s.gps for s in imported)} GPS records, "
+                    f"{sum(s.crowding for s in imported)} crowding records, {sum(s.eta for s in imported)} ETA records, "
+                    f"skipped {sum(s.skipped for s in imported)} rows.",
                 )
-                return redirect("upload_csv")
-
-            created_gps = 0
-            created_crowding = 0
-            created_eta = 0
-            skipped = 0
-            total = 0
-            first_error = None
-
-            for row in reader:
-                total += 1
-
-                try:
-                    # ---- Parse / validate base fields ----
-                    bus_id = (row.get("bus_id") or "").strip()
-                    if not bus_id:
-                        raise ValueError("empty bus_id")
-
-                    # robust timestamp parse (supports trailing Z)
-                    ts_raw = (row.get("timestamp") or "").strip()
-                    if not ts_raw:
-                        raise ValueError("empty timestamp")
-                    ts = dt.datetime.fromisoformat(ts_raw.replace("Z", "+00:00"))
-
-                    lat = float((row.get("lat") or "").strip())
-                    lon = float((row.get("lon") or "").strip())
-                    speed = float((row.get("speed") or "").strip())
-                    capacity = int(float((row.get("capacity") or "").strip()))
-                    weight_str = (row.get("weight") or "").strip()
-                    weight = float(weight_str) if weight_str != "" else None
-
-                    # ---- Upsert Bus ----
-                    bus, _ = Bus.objects.get_or_create(
-                        bus_id=bus_id,
-                        defaults={"capacity": capacity},
-                    )
-                    if bus.capacity != capacity:
-                        bus.capacity = capacity
-                        bus.save(update_fields=["capacity"])
-
-                    # ---- Upsert BusStop (optional) ----
-                    stop_id = (row.get("stop_id") or "").strip()
-                    stop_obj = None
-                    if stop_id:
-                        stop_name = (row.get("stop_name") or stop_id).strip()
-
-                        # If stop_lat/stop_lon missing, keep previous values if stop exists
-                        stop_lat_raw = (row.get("stop_lat") or "").strip()
-                        stop_lon_raw = (row.get("stop_lon") or "").strip()
-
-                        defaults = {"name": stop_name}
-                        if stop_lat_raw != "" and stop_lon_raw != "":
-                            defaults["latitude"] = float(stop_lat_raw)
-                            defaults["longitude"] = float(stop_lon_raw)
-
-                        stop_obj, _ = BusStop.objects.update_or_create(
-                            stop_id=stop_id,
-                            defaults=defaults,
-                        )
-
-                    # ---- Create GPSRecord ----
-                    gps = GPSRecord.objects.create(
-                        bus=bus,
-                        timestamp=ts,
-                        latitude=lat,
-                        longitude=lon,
-                        speed=speed,
-                        weight=weight,
-                    )
-                    created_gps += 1
-
-                    # ---- Create CrowdingRecord ----
-                    if gps.weight is not None and bus.capacity > 0:
-                        est_passengers = gps.weight / 75.0
-                        occ = est_passengers / float(bus.capacity)
-                        lvl = crowding_level(occ)
-                        CrowdingRecord.objects.create(
-                            bus=bus,
-                            timestamp=gps.timestamp,
-                            occupancy_ratio=occ,
-                            level=lvl,
-                        )
-                        created_crowding += 1
-
-                    # ---- Create ETARecord ----
-                    if stop_obj is not None:
-                        distance = haversine_m(gps.latitude, gps.longitude, stop_obj.latitude, stop_obj.longitude)
-                        speed_mps = max(0.0, gps.speed) * 1000.0 / 3600.0
-                        if speed_mps >= 1.0:
-                            eta_s = int(distance / speed_mps)
-                            ETARecord.objects.create(
-                                bus=bus,
-                                stop=stop_obj,
-                                source_timestamp=gps.timestamp,
-                                eta_seconds=eta_s,
-                                eta_minutes=eta_s / 60.0,
-                                distance_m=distance,
-                            )
-                        else:
-                            ETARecord.objects.create(
-                                bus=bus,
-                                stop=stop_obj,
-                                source_timestamp=gps.timestamp,
-                                eta_seconds=None,
-                                eta_minutes=None,
-                                distance_m=distance,
-                            )
-                        created_eta += 1
-
-                except Exception as e:
-                    skipped += 1
-                    if first_error is None:
-                        # keep the first error only (avoid spamming)
-                        first_error = f"{type(e).__name__}: {e}"
-                    continue
-
-            msg = (
-                f"Upload complete. Read {total} rows, inserted {created_gps} GPS records, "
-                f"{created_crowding} crowding records, {created_eta} ETA records, skipped {skipped} rows."
-            )
-            if first_error:
-                msg += f" First error: {first_error}"
-            messages.success(request, msg)
+            for summary in summaries:
+                if summary.error:
+                    messages.error(request, summary.message())
+                elif len(summaries) > 1:
+                    messages.info(request, summary.message())
+                else:
+                    messages.success(request, "Upload complete. " + summary.message())
             return redirect("upload_csv")
     else:
         form = CSVUploadForm()
@@ -195,43 +91,31 @@ def upload_csv(request):
     return render(request, "core/upload.html", {"form": form})
 
 
-def haversine_m(lat1, lon1, lat2, lon2):
-    R = 6371000.0
-    p1 = math.radians(lat1)
-    p2 = math.radians(lat2)
-    dlat = math.radians(lat2 - lat1)
-    dlon = math.radians(lon2 - lon1)
-    a = (math.sin(dlat/2)**2) + math.cos(p1)*math.cos(p2)*(math.sin(dlon/2)**2)
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return R * c
-
-
-def crowding_level(occupancy_ratio: float) -> str:
-    if occupancy_ratio < 0.5:
-        return "LOW"
-    if occupancy_ratio < 0.8:
-        return "MEDIUM"
-    if occupancy_ratio < 1.0:
-        return "HIGH"
-    return "OVERCROWDED"
-
-
 def dashboard(request):
-    # show latest crowding + latest ETA per bus
+    """
+    Latest crowding + latest ETA per bus, plus trend charts.
+
+    Query params:
+      stop_id  stop used for ETA cards/chart
+      start    ISO8601 start of the chart window (default: 24 h before the newest record)
+      end      ISO8601 end of the chart window (default: latest record)
+      points   per-bus point budget for the charts (default 200)
+    """
     buses = Bus.objects.all().order_by("bus_id")
     stops = BusStop.objects.all().order_by("stop_id")
 
     selected_stop_id = request.GET.get("stop_id") or ""
     selected_stop = BusStop.objects.filter(stop_id=selected_stop_id).first() if selected_stop_id else None
 
-    cards = []
-    chart_labels = []
-    crowding_series = {}  # bus_id -> [ratios]
-    eta_series = {}       # bus_id -> [minutes]
-
-    # choose last N records per bus for plotting
-    N = 20
+    start = _parse_window_param(request.GET.get("start"))
+    end = _parse_window_param(request.GET.get("end"))
+    try:
+        points = int(request.GET.get("points") or DEFAULT_CHART_POINTS)
+    except ValueError:
+        points = DEFAULT_CHART_POINTS
+    points = min(max(points, 3), MAX_CHART_POINTS)
 
+    cards = []
     for bus in buses:
         latest_c = CrowdingRecord.objects.filter(bus=bus).order_by("-timestamp").first()
         latest_eta = None
@@ -246,32 +130,66 @@ def dashboard(request):
             "latest_eta_min": round(latest_eta.eta_minutes, 1) if (latest_eta and latest_eta.eta_minutes is not None) else None,
         })
 
-        # build time series
-        c_qs = list(CrowdingRecord.objects.filter(bus=bus).order_by("-timestamp")[:N])
-        c_qs.reverse()
-        crowding_series[bus.bus_id] = [round(x.occupancy_ratio, 3) for x in c_qs]
+    # ---- Time-aligned, downsampled chart series ----
+    from .series import align_series, series_frame
 
-        if selected_stop:
-            e_qs = list(ETARecord.objects.filter(bus=bus, stop=selected_stop).order_by("-source_timestamp")[:N])
-            e_qs.reverse()
-            eta_series[bus.bus_id] = [round(x.eta_minutes, 2) if x.eta_minutes is not None else None for x in e_qs]
-        else:
-            eta_series[bus.bus_id] = []
+    c_qs, c_start, c_end = _chart_window(CrowdingRecord.objects.all(), "timestamp", start, end)
+    crowding = align_series(
+        series_frame(c_qs.values_list("bus__bus_id", "timestamp", "occupancy_ratio")),
+        points, start=c_start, end=c_end,
+    )
 
-        # shared labels: use the first bus's crowding timestamps if available
-        if not chart_labels and c_qs:
-            chart_labels = [x.timestamp.isoformat() for x in c_qs]
+    eta = {"labels": [], "series": {}}
+    if selected_stop:
+        e_qs, e_start, e_end = _chart_window(
+            ETARecord.objects.filter(stop=selected_stop), "source_timestamp", start, end,
+        )
+        eta = align_series(
+            series_frame(e_qs.values_list("bus__bus_id", "source_timestamp", "eta_minutes")),
+            points, start=e_start, end=e_end,
+        )
 
     context = {
         "cards": cards,
         "stops": stops,
         "selected_stop_id": selected_stop_id,
-        "chart_labels_json": json.dumps(chart_labels),
-        "crowding_series_json": json.dumps(crowding_series),
-        "eta_series_json": json.dumps(eta_series),
+        "chart_labels_json": json.dumps(crowding["labels"]),
+        "crowding_series_json": json.dumps(crowding["series"]),
+        "eta_labels_json": json.dumps(eta["labels"]),
+        "eta_series_json": json.dumps(eta["series"]),
     }
     return render(request, "core/dashboard.html", context)
 
+
+def _chart_window(qs, ts_field, start, end):
+    """
+    Filter qs to the chart window; returns (qs, start, end).
+
+    Without a start, the window is the DEFAULT_CHART_WINDOW before the newest
+    record (up to end), found with one indexed MAX query.
+    """
+    if end:
+        qs = qs.filter(**{f"{ts_field}__lte": end})
+    if start is None:
+        newest = qs.aggregate(newest=Max(ts_field))["newest"]
+        if newest is None:
+            return qs.none(), None, end
+        start = newest - DEFAULT_CHART_WINDOW
+    return qs.filter(**{f"{ts_field}__gte": start}), start, end
+
+
+def _parse_window_param(raw):
+    raw = (raw or "").strip()
+    if not raw:
+        return None
+    try:
+        value = parse_datetime(raw.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if value is not None and value.tzinfo is None:
+        value = value.replace(tzinfo=dt.timezone.utc)
+    return value
+
 def export_xlsx(request):
     """
     Export latest crowding + latest ETA (for selected stop) to an .xlsx file.
@@ -294,6 +212,8 @@ def export_xlsx(request):
         crowding_timestamp=latest_c_ts,
     ).order_by("bus_id")
 
+    from openpyxl import Workbook
+
     # Prepare workbook
     wb = Workbook()
     ws = wb.active
@@ -349,3 +269,122 @@ def export_xlsx(request):
     response["Content-Disposition"] = 'attachment; filename="smart_bus_export.xlsx"'
     wb.save(response)
     return response
+
+
+def stop_arrivals(request, stop_id):
+    """
+    Next arrivals at a stop across all buses, soonest first (JSON).
+
+    Served from the StopArrival index (one query). Buses whose latest ETA is
+    unknown are listed last with null times.
+
+    Usage:
+      /api/stops/S001/arrivals/?limit=10
+    """
+    try:
+        limit = int(request.GET.get("limit") or DEFAULT_ARRIVALS)
+    except ValueError:
+        limit = DEFAULT_ARRIVALS
+    limit = min(max(limit, 1), MAX_ARRIVALS)
+
+    arrivals = arrivals_for_stop(stop_id, limit)
+    if not arrivals and not BusStop.objects.filter(stop_id=stop_id).exists():
+        return JsonResponse({"error": f"Unknown stop {stop_id}"}, status=404)
+
+    return JsonResponse({
+        "stop_id": stop_id,
+        "arrivals": [
+            {
+                "bus_id": a.bus.bus_id,
+                "predicted_arrival": a.predicted_arrival.isoformat() if a.predicted_arrival else None,
+                "eta_seconds": a.eta_seconds,
+                "distance_m": round(a.distance_m, 1) if a.distance_m is not None else None,
+                "source_timestamp": a.source_timestamp.isoformat(),
+            }
+            for a in arrivals
+        ],
+    })
+
+
+def crowding_heatmap(request):
+    """
+    Crowding per grid cell for a bounding box and time window (JSON).
+
+    Query params:
+      bbox   min_lon,min_lat,max_lon,max_lat (required)
+      start  ISO8601 start of the window (optional, whole hours)
+      end    ISO8601 end of the window (optional)
+      zoom   grid level 0 (coarse) .. 2 (fine); default: finest that fits the box
+
+    Usage:
+      /api/heatmap/?bbox=-80.0,40.40,-79.90,40.48&start=2025-12-15T00:00:00Z
+    """
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(v) for v in request.GET["bbox"].split(","))
+    except (KeyError, ValueError):
+        return JsonResponse({"error": "bbox=min_lon,min_lat,max_lon,max_lat is required"}, status=400)
+    if not all(math.isfinite(v) for v in (min_lon, min_lat, max_lon, max_lat)):
+        return JsonResponse({"error": "bbox values must be finite numbers"}, status=400)
+    if min_lon > max_lon or min_lat > max_lat:
+        return JsonResponse({"error": "bbox minimums must not exceed maximums"}, status=400)
+
+    zoom_raw = request.GET.get("zoom")
+    if zoom_raw:
+        try:
+            zoom = int(zoom_raw)
+        except ValueError:
+            zoom = -1
+        if not 0 <= zoom < len(CELL_SIZES):
+            return JsonResponse({"error": f"zoom must be between 0 and {len(CELL_SIZES) - 1}"}, status=400)
+        if count_cells(min_lat, min_lon, max_lat, max_lon, zoom) > MAX_CELLS:
+            return JsonResponse({"error": "Too many cells in view, use a lower zoom"}, status=400)
+    else:
+        zoom = pick_zoom(min_lat, min_lon, max_lat, max_lon)
+
+    start = _parse_window_param(request.GET.get("start"))
+    end = _parse_window_param(request.GET.get("end"))
+    cells = cells_in_view(min_lat, min_lon, max_lat, max_lon, zoom, start=start, end=end)
+    return JsonResponse({"zoom": zoom, "cell_size_deg": CELL_SIZES[zoom], "cells": cells})
+
+
+def export_history(request):
+    """
+    Stream GPS, crowding or ETA history as gzip CSV, Parquet or Feather.
+
+    Query params:
+      kind    gps | crowding | eta (default gps)
+      format  csv.gz | parquet | feather (default csv.gz)
+      bus_id  one or more bus ids (repeat the param or comma-separate)
+      stop_id only for kind=eta
+      start, end  ISO8601 time window
+
+    Rows are read and encoded in chunks (see core/history.py), so memory
+    stays bounded for any size of extract.
+
+    Usage:
+      /export/history?kind=eta&format=parquet&stop_id=S001&start=2025-12-15T00:00:00Z
+    """
+    from .history import FORMATS, export_chunks, history_queryset, iter_frames
+
+    kind = request.GET.get("kind") or "gps"
+    fmt = request.GET.get("format") or "csv.gz"
+    bus_ids = [b.strip() for raw in request.GET.getlist("bus_id") for b in raw.split(",") if b.strip()]
+    stop_id = (request.GET.get("stop_id") or "").strip() or None
+
+    if fmt not in FORMATS:
+        return JsonResponse({"error": f"format must be one of: {', '.join(FORMATS)}"}, status=400)
+    # A window that silently fell back to "everything" would stream the whole table
+    window = {}
+    for name in ("start", "end"):
+        window[name] = _parse_window_param(request.GET.get(name))
+        if window[name] is None and (request.GET.get(name) or "").strip():
+            return JsonResponse({"error": f"{name} must be an ISO8601 datetime"}, status=400)
+    try:
+        qs = history_queryset(kind, bus_ids=bus_ids, stop_id=stop_id, **window)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    content_type, ext = FORMATS[fmt]
+    response = StreamingHttpResponse(export_chunks(kind, fmt, iter_frames(kind, qs)), content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="smart_bus_{kind}_history.{ext}"'
+    return response
@@ -0,0 +1,20 @@
+"""
+Gunicorn settings (read automatically from the working directory).
+
+Workers are forked from a master that has already imported the Django app
+(see config/wsgi.py), so new workers start serving almost immediately when
+we scale up. Heavy export/analytics libraries stay lazy and are only loaded
+by the worker that first needs them.
+"""
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("GUNICORN_WORKERS", "2"))
+preload_app = True
+
+
+def post_fork(server, worker):
+    # Never share a database connection inherited from the master
+    from django.db import connections
+
+    connections.close_all()